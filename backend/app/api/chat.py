@@ -1,7 +1,13 @@
 """Chat API endpoint."""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.responses import StreamingResponse
+import json
+from sqlalchemy import insert, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict
+from functools import lru_cache
+import asyncio
+import re
 import uuid
 from datetime import datetime
 
@@ -12,7 +18,8 @@ from app.services.guardrail_service import GuardrailService
 from app.services.tier_service import TierService
 from app.services.rag_service import RAGService
 from app.services.response_validator import ResponseValidator
-from app.utils.db import get_db
+from app.utils.config import settings
+from app.utils.db import next_ticket_id, AsyncSessionLocal
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -27,9 +34,31 @@ response_validator = ResponseValidator()
 # Namespace for generating UUIDs from session IDs
 SESSION_NAMESPACE = uuid.UUID('6ba7b810-9dad-11d1-80b4-00c04fd430c8')
 
+# Strong references to fire-and-forget tasks: the event loop keeps only
+# a weak reference to scheduled tasks, so an otherwise-unreferenced task
+# can be garbage-collected before it runs and its write silently lost
+_pending_tasks: set = set()
 
+
+def _spawn(coro) -> None:
+    """Schedule a fire-and-forget coroutine, holding a strong reference
+    until it completes."""
+    task = asyncio.ensure_future(coro)
+    _pending_tasks.add(task)
+    task.add_done_callback(_pending_tasks.discard)
+
+
+# Precompiled alternation for explicit repeated-failure phrasing
+_FAILURE_RE = re.compile(
+    r"\b(?:still fail(?:s|ing)|still not working|doesn'?t work|tried again|"
+    r"tried multiple times|3 times|three times|same error|persists|not resolved)\b",
+    re.IGNORECASE
+)
+
+
+@lru_cache(maxsize=8192)
 def _session_id_to_uuid(session_id: str) -> str:
-    """Convert session_id string to deterministic UUID string."""
+    """Convert session_id string to deterministic UUID string (pure, memoized)."""
     try:
         # Try to parse as UUID first
         uuid.UUID(session_id)
@@ -39,31 +68,28 @@ def _session_id_to_uuid(session_id: str) -> str:
         return str(uuid.uuid5(SESSION_NAMESPACE, session_id))
 
 
-def _create_ticket(db: Session, request: ChatRequest, tier: Tier, severity: Severity, answer: str) -> str:
-    """Create a support ticket for escalated issues."""
+async def _create_ticket(request: ChatRequest, tier: Tier, severity: Severity, answer: str, ctx_dict: Dict) -> str:
+    """Create a support ticket for escalated issues (own short-lived session)."""
     try:
-        # Generate ticket ID
-        ticket_count = db.query(Ticket).count()
-        ticket_id = f"TICKET-{ticket_count + 1:04d}"
-        
-        # Create ticket
-        ticket = Ticket(
-            id=ticket_id,
-            session_id=_session_id_to_uuid(request.session_id),
-            subject=f"Escalated Chat: {request.message[:50]}...",
-            description=f"User Message: {request.message}\n\nAI Response: {answer}",
-            tier=tier.value,
-            severity=severity.value,
-            status="OPEN",
-            user_role=request.user_role.value,
-            context=request.context.model_dump(),
-            ai_analysis=f"Escalated due to severity {severity.value} or repeated failure."
-        )
-        
-        db.add(ticket)
-        db.commit()
-        db.refresh(ticket)
-        
+        async with AsyncSessionLocal() as db:
+            # Generate ticket ID (sequence-backed, concurrency-safe)
+            ticket_id = await next_ticket_id(db)
+
+            # Core insert: single row, no unit-of-work bookkeeping needed
+            await db.execute(insert(Ticket).values(
+                id=ticket_id,
+                session_id=_session_id_to_uuid(request.session_id),
+                subject=f"Escalated Chat: {request.message[:50]}...",
+                description=f"User Message: {request.message}\n\nAI Response: {answer}",
+                tier=tier.value,
+                severity=severity.value,
+                status="OPEN",
+                user_role=request.user_role.value,
+                context=ctx_dict,
+                ai_analysis=f"Escalated due to severity {severity.value} or repeated failure."
+            ))
+            await db.commit()
+
         logger.info("auto_ticket_created", ticket_id=ticket_id)
         return ticket_id
     except Exception as e:
@@ -71,69 +97,139 @@ def _create_ticket(db: Session, request: ChatRequest, tier: Tier, severity: Seve
         return None
 
 
-def _get_conversation_history(db: Session, conversation_id: str) -> List[Dict[str, str]]:
-    """Get recent conversation history for context."""
-    messages = db.query(Message).filter(
-        Message.conversation_id == conversation_id
-    ).order_by(Message.created_at.desc()).limit(10).all()
-    
-    # Reverse to get chronological order
-    messages = list(reversed(messages))
-    
-    history = []
-    for msg in messages:
-        history.append({
-            "role": msg.role,
-            "content": msg.content
-        })
-    
-    return history
+async def _log_guardrail_event(session_uuid: str, trigger_type, severity, user_message: str):
+    """Record a guardrail activation off the request path (own session)."""
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(insert(GuardrailEvent).values(
+                session_id=session_uuid,
+                trigger_type=trigger_type.value,
+                severity=severity.value,
+                user_message=user_message
+            ))
+            await db.commit()
+    except Exception as e:
+        logger.error("guardrail_event_persistence_failed",
+                    session_id=session_uuid,
+                    error=str(e))
+
+
+async def _get_conversation_with_history(db: AsyncSession, session_uuid: str):
+    """Fetch the conversation and its recent history in one round trip.
+
+    Joins the conversation row against its most recent messages (bounded
+    by max_conversation_history, re-sorted chronological server-side), so
+    the endpoint no longer issues separate lookup and history queries.
+    """
+    conv_ids = select(Conversation.id).where(
+        Conversation.session_id == session_uuid
+    ).scalar_subquery()
+    recent = (
+        select(Message.role, Message.content, Message.content_tokens, Message.created_at)
+        .where(Message.conversation_id.in_(conv_ids))
+        .order_by(Message.created_at.desc())
+        .limit(settings.max_conversation_history)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(Conversation, recent.c.role, recent.c.content, recent.c.content_tokens)
+        .outerjoin(recent, true())
+        .where(Conversation.session_id == session_uuid)
+        .order_by(recent.c.created_at.asc())
+    )).all()
+
+    if not rows:
+        return (None, [])
+
+    conversation = rows[0][0]
+    history = [
+        {"role": role, "content": content, "content_tokens": content_tokens}
+        for _, role, content, content_tokens in rows
+        if role is not None
+    ]
+    return (conversation, history)
 
 
 def _check_repeated_failure(conversation_history: List[Dict[str, str]], current_message: str) -> bool:
     """Check if this is a repeated failure (similar message asked multiple times)."""
     if len(conversation_history) < 2:
         return False
-    
+
     # Get last 3 user messages
-    user_messages = [msg["content"] for msg in conversation_history if msg["role"] == "user"]
+    user_messages = [msg for msg in conversation_history if msg["role"] == "user"]
     recent_messages = user_messages[-3:] if len(user_messages) >= 3 else user_messages
-    
-    current_lower = current_message.lower()
-    
-    # Check for explicit failure keywords
-    failure_keywords = [
-        "still fails", "still failing", "still not working", "doesn't work",
-        "tried again", "tried multiple times", "3 times", "three times",
-        "same error", "persists", "not resolved"
-    ]
-    
-    if any(keyword in current_lower for keyword in failure_keywords):
+
+    # Check for explicit failure keywords via one compiled scan
+    if _FAILURE_RE.search(current_message):
         return True
-    
-    # Check for semantic overlap with recent messages
+
+    # Tokenize the current message once for all overlap comparisons
+    current_words = frozenset(current_message.lower().split())
+    if not current_words:
+        return False
+
+    # Check for keyword overlap with recent messages (Jaccard); use the
+    # tokens materialized at insert time, re-tokenizing only legacy rows
     for msg in recent_messages:
-        msg_lower = msg.lower()
-        
-        # Check for keyword overlap
-        current_words = set(current_lower.split())
-        recent_words = set(msg_lower.split())
-        
-        if not current_words or not recent_words:
+        tokens = msg.get("content_tokens")
+        recent_words = set(tokens) if tokens else set(msg["content"].lower().split())
+        if not recent_words:
             continue
-            
-        overlap = len(current_words & recent_words) / len(current_words | recent_words)
-        if overlap > 0.6:
+
+        # |A ∪ B| = |A| + |B| - |A ∩ B| avoids building the union set
+        intersection = len(current_words & recent_words)
+        union = len(current_words) + len(recent_words) - intersection
+        if intersection / union > 0.6:
             return True
-            
+
     return False
 
 
+async def _persist_turn(
+    conversation_id: str,
+    user_content: str,
+    answer: str,
+    kb_references: List[Dict],
+    confidence: float,
+    tier: Tier,
+    severity: Severity
+):
+    """Persist a completed conversation turn after the response was sent."""
+    try:
+        async with AsyncSessionLocal() as db:
+            # Core executemany: both rows in one statement, no ORM flush machinery
+            await db.execute(insert(Message), [
+                {
+                    "conversation_id": conversation_id,
+                    "role": "user",
+                    "content": user_content,
+                    "content_tokens": sorted(set(user_content.lower().split())),
+                    "tier": tier.value,
+                    "severity": severity.value
+                },
+                {
+                    "conversation_id": conversation_id,
+                    "role": "assistant",
+                    "content": answer,
+                    "kb_references": kb_references,
+                    "confidence": confidence,
+                    "tier": tier.value,
+                    "severity": severity.value,
+                    "guardrail_blocked": False
+                }
+            ])
+            await db.commit()
+    except Exception as e:
+        logger.error("turn_persistence_failed",
+                    conversation_id=conversation_id,
+                    error=str(e))
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
     """
     Main chat endpoint for AI Help Desk.
-    
+
     Workflow:
     1. Validate request
     2. Check guardrails
@@ -148,67 +244,67 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
                session_id=request.session_id,
                user_role=request.user_role.value,
                message_preview=request.message[:100])
-    
+
     try:
-        # Step 1: Check guardrails (now with semantic detection)
-        is_blocked, trigger_type, severity, reason = await guardrail_service.check_guardrails(request.message)
-        
-        if is_blocked:
-            # Log guardrail event
-            guardrail_event = GuardrailEvent(
-                session_id=_session_id_to_uuid(request.session_id),
-                trigger_type=trigger_type.value,
-                severity=severity.value,
-                user_message=request.message
-            )
-            db.add(guardrail_event)
-            db.commit()
-            
-            logger.warning("guardrail_blocked_request",
-                          session_id=request.session_id,
-                          trigger_type=trigger_type.value,
-                          severity=severity.value)
-            
-            # Return blocked response
-            safe_response = guardrail_service.get_safe_response(trigger_type, reason)
-            
-            return ChatResponse(
-                answer=safe_response,
-                kb_references=[],
-                confidence=0.0,
-                tier=Tier.TIER_3,  # Auto-escalate guardrail violations
-                severity=severity,
-                needs_escalation=True,
-                guardrail=GuardrailInfo(blocked=True, reason=reason),
-                ticket_id=None
-            )
-        
-        # Step 2: Get or create conversation
-        conversation = db.query(Conversation).filter(
-            Conversation.session_id == _session_id_to_uuid(request.session_id)
-        ).first()
-        
-        if not conversation:
-            conversation = Conversation(
-                session_id=_session_id_to_uuid(request.session_id),
-                user_role=request.user_role.value,
-                context=request.context.model_dump()
+        sid_uuid = _session_id_to_uuid(request.session_id)
+        # Materialized once: model_dump walks the model tree on every call
+        ctx_dict = request.context.model_dump()
+
+        # Session window 1: only the fast lookups/writes hold a connection.
+        # Released before the multi-second RAG + LLM work so the pool
+        # never has connections parked behind slow requests.
+        async with AsyncSessionLocal() as db:
+            # Steps 1+2 overlapped: the guardrail check (CPU + embedding call) and
+            # the conversation+history fetch (DB I/O) are independent, so run together
+            (is_blocked, trigger_type, severity, reason), (conversation, conversation_history) = await asyncio.gather(
+                guardrail_service.check_guardrails(request.message),
+                _get_conversation_with_history(db, sid_uuid)
             )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-        
-        # Step 3: Get conversation history
-        conversation_history = _get_conversation_history(db, conversation.id)
-        
-        
-        # Step 4: Execute RAG pipeline
+
+            if is_blocked:
+                # Log the event off the response path: the reject case must
+                # stay cheap so abusive traffic cannot amplify into DB writes
+                background_tasks.add_task(
+                    _log_guardrail_event, sid_uuid, trigger_type, severity, request.message
+                )
+
+                logger.warning("guardrail_blocked_request",
+                              session_id=request.session_id,
+                              trigger_type=trigger_type.value,
+                              severity=severity.value)
+
+                # Return blocked response
+                safe_response = guardrail_service.get_safe_response(trigger_type, reason)
+
+                return ChatResponse(
+                    answer=safe_response,
+                    kb_references=[],
+                    confidence=0.0,
+                    tier=Tier.TIER_3,  # Auto-escalate guardrail violations
+                    severity=severity,
+                    needs_escalation=True,
+                    guardrail=GuardrailInfo(blocked=True, reason=reason),
+                    ticket_id=None
+                )
+
+            # Step 2: Create conversation if this is a new session (history already fetched)
+            if not conversation:
+                conversation = Conversation(
+                    session_id=sid_uuid,
+                    user_role=request.user_role.value,
+                    context=ctx_dict
+                )
+                db.add(conversation)
+                await db.commit()
+
+            conversation_id = conversation.id
+
+        # Step 4: Execute RAG pipeline (no DB connection held here)
         answer, kb_references, confidence, has_kb_coverage = await rag_service.retrieve_and_generate(
             user_message=request.message,
-            db=db,
             conversation_history=conversation_history
         )
-        
+
         # Step 4.5: Validate response for policy compliance
         is_valid, violation_type, safe_replacement = response_validator.validate_response(
             response=answer,
@@ -216,7 +312,7 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
             kb_references=kb_references,
             confidence=confidence
         )
-        
+
         if not is_valid:
             logger.warning("response_validation_failed",
                           session_id=request.session_id,
@@ -230,55 +326,43 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
         else:
             # Sanitize response to remove any sensitive info
             answer = response_validator.sanitize_response(answer)
-            
+
             # Step 5: Classify tier and severity
             tier, severity, needs_escalation = tier_service.classify_tier_and_severity(
                 message=request.message,
                 user_role=request.user_role,
-                context=request.context.model_dump(),
+                context=ctx_dict,
                 kb_coverage=has_kb_coverage,
                 repeated_failure=_check_repeated_failure(conversation_history, request.message)
             )
-        
+
         # Step 5.5: Create ticket if escalation needed
         ticket_id = None
         if needs_escalation:
-            ticket_id = _create_ticket(db, request, tier, severity, answer)
+            ticket_id = await _create_ticket(request, tier, severity, answer, ctx_dict)
             # Append ticket info to answer
             if ticket_id:
                 answer += f"\n\nI have created a support ticket ({ticket_id}) for this issue. A support engineer will review it shortly."
-        
-        # Step 6: Save user message
-        user_message = Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=request.message,
-            tier=tier.value,
-            severity=severity.value
-        )
-        db.add(user_message)
-        
-        # Step 7: Save assistant response
-        assistant_message = Message(
-            conversation_id=conversation.id,
-            role="assistant",
-            content=answer,
-            kb_references=kb_references,
-            confidence=confidence,
-            tier=tier.value,
-            severity=severity.value,
-            guardrail_blocked=False
+
+        # Steps 6-7: Save both messages off the response path
+        background_tasks.add_task(
+            _persist_turn,
+            conversation_id,
+            request.message,
+            answer,
+            kb_references,
+            confidence,
+            tier,
+            severity
         )
-        db.add(assistant_message)
-        db.commit()
-        
+
         logger.info("chat_response_generated",
                    session_id=request.session_id,
                    tier=tier.value,
                    severity=severity.value,
                    confidence=confidence,
                    needs_escalation=needs_escalation)
-        
+
         # Step 8: Return response
         return ChatResponse(
             answer=answer,
@@ -290,9 +374,156 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
             guardrail=GuardrailInfo(blocked=False, reason=None),
             ticket_id=ticket_id
         )
-        
+
     except Exception as e:
         logger.error("chat_request_failed",
                     session_id=request.session_id,
                     error=str(e))
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def _sse_event(payload: Dict) -> str:
+    """Format a payload as a server-sent event."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (SSE).
+
+    Emits "token" events as the LLM generates, then a final "done" event
+    with the same metadata as /chat (tier, severity, ticket_id, ...).
+    Time-to-first-byte is first-token latency instead of full generation.
+    """
+    logger.info("chat_stream_request_received",
+               session_id=request.session_id,
+               user_role=request.user_role.value,
+               message_preview=request.message[:100])
+
+    sid_uuid = _session_id_to_uuid(request.session_id)
+    # Materialized once: model_dump walks the model tree on every call
+    ctx_dict = request.context.model_dump()
+
+    # Session window: released before streaming starts so the connection
+    # is not held for the lifetime of the (long) SSE response
+    async with AsyncSessionLocal() as db:
+        (is_blocked, trigger_type, severity, reason), (conversation, conversation_history) = await asyncio.gather(
+            guardrail_service.check_guardrails(request.message),
+            _get_conversation_with_history(db, sid_uuid)
+        )
+
+        if is_blocked:
+            # Persist the event off the response path (see /chat)
+            _spawn(
+                _log_guardrail_event(sid_uuid, trigger_type, severity, request.message)
+            )
+
+        elif not conversation:
+            conversation = Conversation(
+                session_id=sid_uuid,
+                user_role=request.user_role.value,
+                context=ctx_dict
+            )
+            db.add(conversation)
+            await db.commit()
+
+        conversation_id = conversation.id if conversation else None
+
+    if is_blocked:
+        safe_response = guardrail_service.get_safe_response(trigger_type, reason)
+
+        async def blocked_stream():
+            yield _sse_event({"type": "token", "content": safe_response})
+            yield _sse_event({
+                "type": "done",
+                "confidence": 0.0,
+                "tier": Tier.TIER_3.value,
+                "severity": severity.value,
+                "needs_escalation": True,
+                "guardrail": {"blocked": True, "reason": reason},
+                "kb_references": [],
+                "ticket_id": None
+            })
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(blocked_stream(), media_type="text/event-stream")
+
+    async def event_stream():
+        try:
+            answer_parts = []
+            kb_references, confidence, has_kb_coverage = [], 0.0, False
+
+            async for event in rag_service.retrieve_and_stream(
+                user_message=request.message,
+                conversation_history=conversation_history
+            ):
+                if event["type"] == "token":
+                    answer_parts.append(event["content"])
+                    yield _sse_event(event)
+                else:
+                    kb_references = event["kb_references"]
+                    confidence = event["confidence"]
+                    has_kb_coverage = event["has_kb_coverage"]
+
+            answer = "".join(answer_parts)
+
+            # Post-stream: same validation / classification / ticket flow as /chat
+            is_valid, violation_type, safe_replacement = response_validator.validate_response(
+                response=answer,
+                user_message=request.message,
+                kb_references=kb_references,
+                confidence=confidence
+            )
+
+            if not is_valid:
+                answer = safe_replacement
+                confidence = 0.0
+                needs_escalation = True
+                tier = Tier.TIER_3
+                severity = Severity.HIGH
+                yield _sse_event({"type": "replacement", "content": answer})
+            else:
+                answer = response_validator.sanitize_response(answer)
+                tier, severity, needs_escalation = tier_service.classify_tier_and_severity(
+                    message=request.message,
+                    user_role=request.user_role,
+                    context=ctx_dict,
+                    kb_coverage=has_kb_coverage,
+                    repeated_failure=_check_repeated_failure(conversation_history, request.message)
+                )
+
+            ticket_id = None
+            if needs_escalation:
+                ticket_id = await _create_ticket(request, tier, severity, answer, ctx_dict)
+
+            # Persist the turn off the stream path
+            _spawn(_persist_turn(
+                conversation_id,
+                request.message,
+                answer,
+                kb_references,
+                confidence,
+                tier,
+                severity
+            ))
+
+            yield _sse_event({
+                "type": "done",
+                "confidence": confidence,
+                "tier": tier.value,
+                "severity": severity.value,
+                "needs_escalation": needs_escalation,
+                "guardrail": {"blocked": False, "reason": None},
+                "kb_references": kb_references,
+                "ticket_id": ticket_id
+            })
+            yield "data: [DONE]\n\n"
+
+        except Exception as e:
+            logger.error("chat_stream_failed",
+                        session_id=request.session_id,
+                        error=str(e))
+            yield _sse_event({"type": "error", "detail": "Internal server error"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
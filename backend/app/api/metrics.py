@@ -1,9 +1,10 @@
 """Metrics and analytics API endpoints."""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, func, and_, literal
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Dict, List
+import time
 
 from app.models.schemas import MetricsSummary, MetricsTrends, TrendDataPoint
 from app.models.database import Conversation, Message, Ticket, GuardrailEvent
@@ -13,59 +14,93 @@ from app.utils.logger import get_logger
 logger = get_logger(__name__)
 router = APIRouter()
 
+# Dashboard numbers are stale the moment they leave the server, so the
+# endpoints serve a short-lived in-process cache instead of re-scanning
+# the tables on every poll. (A Postgres materialized view would also work,
+# but the app has to run on SQLite too.)
+_CACHE_TTL_SECONDS = 60.0
+_metrics_cache: Dict[str, tuple] = {}
+
+
+def _cache_get(key: str):
+    """Return a cached payload if it is younger than the TTL."""
+    entry = _metrics_cache.get(key)
+    if entry and time.monotonic() - entry[0] < _CACHE_TTL_SECONDS:
+        return entry[1]
+    return None
+
+
+def _cache_put(key: str, value):
+    """Store a payload with the current timestamp, dropping expired entries."""
+    now = time.monotonic()
+    for stale in [k for k, (ts, _) in _metrics_cache.items()
+                  if now - ts >= _CACHE_TTL_SECONDS]:
+        del _metrics_cache[stale]
+    _metrics_cache[key] = (now, value)
+    return value
+
 
 @router.get("/summary", response_model=MetricsSummary)
-async def get_metrics_summary(db: Session = Depends(get_db)):
+async def get_metrics_summary(db: AsyncSession = Depends(get_db)):
     """Get overall metrics summary."""
     try:
-        # Total conversations
-        total_conversations = db.query(Conversation).count()
-        
-        # Total tickets
-        total_tickets = db.query(Ticket).count()
-        
+        cached = _cache_get("summary")
+        if cached is not None:
+            return cached
+
+        # All four scalar metrics in a single round trip via scalar subqueries
+        summary_row = (await db.execute(
+            select(
+                select(func.count()).select_from(Conversation).scalar_subquery().label("total_conversations"),
+                select(func.count()).select_from(Ticket).scalar_subquery().label("total_tickets"),
+                select(func.avg(Message.confidence)).where(
+                    Message.role == "assistant",
+                    Message.confidence.isnot(None)
+                ).scalar_subquery().label("avg_confidence"),
+                select(func.count()).select_from(GuardrailEvent).scalar_subquery().label("guardrail_activations"),
+            )
+        )).one()
+
+        total_conversations = summary_row.total_conversations
+        total_tickets = summary_row.total_tickets
+        avg_confidence = float(summary_row.avg_confidence) if summary_row.avg_confidence else 0.0
+        guardrail_activations = summary_row.guardrail_activations
+
         # Deflection rate (conversations that didn't create tickets)
         if total_conversations > 0:
             deflection_rate = ((total_conversations - total_tickets) / total_conversations) * 100
         else:
             deflection_rate = 0.0
-        
-        # Average confidence
-        avg_confidence_result = db.query(func.avg(Message.confidence)).filter(
-            Message.role == "assistant",
-            Message.confidence.isnot(None)
-        ).scalar()
-        avg_confidence = float(avg_confidence_result) if avg_confidence_result else 0.0
-        
-        # Guardrail activations
-        guardrail_activations = db.query(GuardrailEvent).count()
-        
-        # Tickets by tier
+
+        # Both ticket breakdowns in one round trip via UNION ALL
+        breakdown_rows = (await db.execute(
+            select(
+                literal("tier").label("dimension"),
+                Ticket.tier.label("key"),
+                func.count().label("count")
+            ).group_by(Ticket.tier).union_all(
+                select(
+                    literal("severity"),
+                    Ticket.severity,
+                    func.count()
+                ).group_by(Ticket.severity)
+            )
+        )).all()
+
         tickets_by_tier = {}
-        tier_counts = db.query(
-            Ticket.tier,
-            func.count(Ticket.id)
-        ).group_by(Ticket.tier).all()
-        
-        for tier, count in tier_counts:
-            tickets_by_tier[tier] = count
-        
-        # Tickets by severity
         tickets_by_severity = {}
-        severity_counts = db.query(
-            Ticket.severity,
-            func.count(Ticket.id)
-        ).group_by(Ticket.severity).all()
-        
-        for severity, count in severity_counts:
-            tickets_by_severity[severity] = count
-        
+        for dimension, key, count in breakdown_rows:
+            if dimension == "tier":
+                tickets_by_tier[key] = count
+            else:
+                tickets_by_severity[key] = count
+
         logger.info("metrics_summary_generated",
                    total_conversations=total_conversations,
                    total_tickets=total_tickets,
                    deflection_rate=deflection_rate)
-        
-        return MetricsSummary(
+
+        return _cache_put("summary", MetricsSummary(
             total_conversations=total_conversations,
             total_tickets=total_tickets,
             deflection_rate=round(deflection_rate, 2),
@@ -73,182 +108,225 @@ async def get_metrics_summary(db: Session = Depends(get_db)):
             guardrail_activations=guardrail_activations,
             tickets_by_tier=tickets_by_tier,
             tickets_by_severity=tickets_by_severity
-        )
-        
+        ))
+
     except Exception as e:
         logger.error("metrics_summary_failed", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to generate metrics summary")
 
 
 @router.get("/trends", response_model=MetricsTrends)
-async def get_metrics_trends(days: int = 30, db: Session = Depends(get_db)):
+async def get_metrics_trends(days: int = Query(30, ge=1, le=365), db: AsyncSession = Depends(get_db)):
     """Get trend metrics over time."""
     try:
+        cached = _cache_get(f"trends:{days}")
+        if cached is not None:
+            return cached
+
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
-        
-        # Conversation volume by day
-        conversation_volume = _get_daily_counts(
-            db, Conversation, start_date, end_date
-        )
-        
-        # Ticket volume by day
-        ticket_volume = _get_daily_counts(
-            db, Ticket, start_date, end_date
-        )
-        
-        # Deflection rate by day
-        deflection_rate = _calculate_daily_deflection(
-            db, start_date, end_date
-        )
-        
-        # Average confidence by day
-        avg_confidence = _get_daily_avg_confidence(
-            db, start_date, end_date
-        )
-        
+
+        # All four trend series from a single grouped query
+        (
+            conversation_volume,
+            ticket_volume,
+            deflection_rate,
+            avg_confidence
+        ) = await _get_daily_trends(db, start_date, end_date)
+
         logger.info("metrics_trends_generated", days=days)
-        
-        return MetricsTrends(
+
+        return _cache_put(f"trends:{days}", MetricsTrends(
             conversation_volume=conversation_volume,
             ticket_volume=ticket_volume,
             deflection_rate=deflection_rate,
             avg_confidence=avg_confidence
-        )
-        
+        ))
+
     except Exception as e:
         logger.error("metrics_trends_failed", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to generate metrics trends")
 
 
 @router.get("/deflection")
-async def get_deflection_metrics(db: Session = Depends(get_db)):
+async def get_deflection_metrics(db: AsyncSession = Depends(get_db)):
     """Get detailed deflection rate metrics."""
     try:
-        total_conversations = db.query(Conversation).count()
-        total_tickets = db.query(Ticket).count()
-        
+        cached = _cache_get("deflection")
+        if cached is not None:
+            return cached
+
+        row = (await db.execute(
+            select(
+                select(func.count()).select_from(Conversation).scalar_subquery(),
+                select(func.count()).select_from(Ticket).scalar_subquery(),
+            )
+        )).one()
+        total_conversations, total_tickets = row
+
         if total_conversations > 0:
             deflection_rate = ((total_conversations - total_tickets) / total_conversations) * 100
         else:
             deflection_rate = 0.0
-        
+
         # Issues resolved without tickets
         resolved_without_ticket = total_conversations - total_tickets
-        
+
         logger.info("deflection_metrics_generated",
                    deflection_rate=deflection_rate,
                    resolved_without_ticket=resolved_without_ticket)
-        
-        return {
+
+        return _cache_put("deflection", {
             "deflection_rate": round(deflection_rate, 2),
             "total_conversations": total_conversations,
             "total_tickets": total_tickets,
             "resolved_without_ticket": resolved_without_ticket
-        }
-        
+        })
+
     except Exception as e:
         logger.error("deflection_metrics_failed", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to generate deflection metrics")
 
 
 @router.get("/guardrails")
-async def get_guardrail_metrics(db: Session = Depends(get_db)):
+async def get_guardrail_metrics(db: AsyncSession = Depends(get_db)):
     """Get guardrail activation metrics."""
     try:
-        total_activations = db.query(GuardrailEvent).count()
-        
-        # Activations by trigger type
+        cached = _cache_get("guardrails")
+        if cached is not None:
+            return cached
+
+        # Both group-bys plus the total in one UNION ALL pass
+        # (GROUPING SETS would do the same on Postgres, but not on SQLite)
+        rows = (await db.execute(
+            select(
+                literal("trigger_type").label("dimension"),
+                GuardrailEvent.trigger_type.label("key"),
+                func.count().label("count")
+            ).group_by(GuardrailEvent.trigger_type).union_all(
+                select(
+                    literal("severity"),
+                    GuardrailEvent.severity,
+                    func.count()
+                ).group_by(GuardrailEvent.severity)
+            )
+        )).all()
+
         by_trigger_type = {}
-        trigger_counts = db.query(
-            GuardrailEvent.trigger_type,
-            func.count(GuardrailEvent.id)
-        ).group_by(GuardrailEvent.trigger_type).all()
-        
-        for trigger_type, count in trigger_counts:
-            by_trigger_type[trigger_type] = count
-        
-        # Activations by severity
         by_severity = {}
-        severity_counts = db.query(
-            GuardrailEvent.severity,
-            func.count(GuardrailEvent.id)
-        ).group_by(GuardrailEvent.severity).all()
-        
-        for severity, count in severity_counts:
-            by_severity[severity] = count
-        
+        for dimension, key, count in rows:
+            if dimension == "trigger_type":
+                by_trigger_type[key] = count
+            else:
+                by_severity[key] = count
+
+        total_activations = sum(by_trigger_type.values())
+
         logger.info("guardrail_metrics_generated",
                    total_activations=total_activations)
-        
-        return {
+
+        return _cache_put("guardrails", {
             "total_activations": total_activations,
             "by_trigger_type": by_trigger_type,
             "by_severity": by_severity
-        }
-        
+        })
+
     except Exception as e:
         logger.error("guardrail_metrics_failed", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to generate guardrail metrics")
 
 
-def _get_daily_counts(db: Session, model, start_date: datetime, end_date: datetime) -> List[TrendDataPoint]:
-    """Get daily counts for a model."""
-    counts = db.query(
-        func.date(model.created_at).label('date'),
-        func.count(model.id).label('count')
-    ).filter(
+def _day_start(day) -> datetime:
+    """Convert a DATE() group key (date object or ISO string) to a datetime."""
+    if isinstance(day, str):
+        return datetime.strptime(day, "%Y-%m-%d")
+    return datetime.combine(day, datetime.min.time())
+
+
+async def _get_daily_trends(
+    db: AsyncSession,
+    start_date: datetime,
+    end_date: datetime
+) -> tuple:
+    """Get all four daily trend series in one grouped SQL pass.
+
+    Builds per-table daily CTEs, joins them on the union of observed dates,
+    and derives deflection server-side data in a single scan per table.
+    """
+    conv_daily = select(
+        func.date(Conversation.created_at).label('day'),
+        func.count().label('cnt')
+    ).where(
         and_(
-            model.created_at >= start_date,
-            model.created_at <= end_date
-        )
-    ).group_by(func.date(model.created_at)).all()
-    
-    return [
-        TrendDataPoint(timestamp=datetime.combine(date, datetime.min.time()), value=float(count))
-        for date, count in counts
-    ]
-
-
-def _calculate_daily_deflection(db: Session, start_date: datetime, end_date: datetime) -> List[TrendDataPoint]:
-    """Calculate daily deflection rate."""
-    # This is a simplified version - in production, you'd want more sophisticated calculation
-    daily_conversations = _get_daily_counts(db, Conversation, start_date, end_date)
-    daily_tickets = _get_daily_counts(db, Ticket, start_date, end_date)
-    
-    # Create a map for easy lookup
-    ticket_map = {dp.timestamp: dp.value for dp in daily_tickets}
-    
-    deflection_rates = []
-    for conv_dp in daily_conversations:
-        tickets = ticket_map.get(conv_dp.timestamp, 0)
-        if conv_dp.value > 0:
-            deflection = ((conv_dp.value - tickets) / conv_dp.value) * 100
-        else:
-            deflection = 0.0
-        
-        deflection_rates.append(
-            TrendDataPoint(timestamp=conv_dp.timestamp, value=round(deflection, 2))
+            Conversation.created_at >= start_date,
+            Conversation.created_at <= end_date
         )
-    
-    return deflection_rates
+    ).group_by(func.date(Conversation.created_at)).cte('conv_daily')
 
+    ticket_daily = select(
+        func.date(Ticket.created_at).label('day'),
+        func.count().label('cnt')
+    ).where(
+        and_(
+            Ticket.created_at >= start_date,
+            Ticket.created_at <= end_date
+        )
+    ).group_by(func.date(Ticket.created_at)).cte('ticket_daily')
 
-def _get_daily_avg_confidence(db: Session, start_date: datetime, end_date: datetime) -> List[TrendDataPoint]:
-    """Get daily average confidence scores."""
-    avg_scores = db.query(
-        func.date(Message.created_at).label('date'),
-        func.avg(Message.confidence).label('avg_confidence')
-    ).filter(
+    msg_daily = select(
+        func.date(Message.created_at).label('day'),
+        func.avg(Message.confidence).label('avg_conf')
+    ).where(
         and_(
             Message.created_at >= start_date,
             Message.created_at <= end_date,
             Message.role == "assistant",
             Message.confidence.isnot(None)
         )
-    ).group_by(func.date(Message.created_at)).all()
-    
-    return [
-        TrendDataPoint(timestamp=datetime.combine(date, datetime.min.time()), value=round(float(avg), 2))
-        for date, avg in avg_scores
-    ]
+    ).group_by(func.date(Message.created_at)).cte('msg_daily')
+
+    days = select(conv_daily.c.day).union(
+        select(ticket_daily.c.day),
+        select(msg_daily.c.day)
+    ).cte('days')
+
+    rows = (await db.execute(
+        select(
+            days.c.day,
+            conv_daily.c.cnt,
+            ticket_daily.c.cnt,
+            msg_daily.c.avg_conf
+        ).select_from(
+            days
+            .outerjoin(conv_daily, conv_daily.c.day == days.c.day)
+            .outerjoin(ticket_daily, ticket_daily.c.day == days.c.day)
+            .outerjoin(msg_daily, msg_daily.c.day == days.c.day)
+        ).order_by(days.c.day)
+    )).all()
+
+    conversation_volume = []
+    ticket_volume = []
+    deflection_rate = []
+    avg_confidence = []
+
+    for day, conv_count, ticket_count, avg_conf in rows:
+        timestamp = _day_start(day)
+
+        if conv_count is not None:
+            conversation_volume.append(
+                TrendDataPoint(timestamp=timestamp, value=float(conv_count))
+            )
+            deflection = ((conv_count - (ticket_count or 0)) / conv_count) * 100 if conv_count > 0 else 0.0
+            deflection_rate.append(
+                TrendDataPoint(timestamp=timestamp, value=round(deflection, 2))
+            )
+        if ticket_count is not None:
+            ticket_volume.append(
+                TrendDataPoint(timestamp=timestamp, value=float(ticket_count))
+            )
+        if avg_conf is not None:
+            avg_confidence.append(
+                TrendDataPoint(timestamp=timestamp, value=round(float(avg_conf), 2))
+            )
+
+    return (conversation_volume, ticket_volume, deflection_rate, avg_confidence)
@@ -2,6 +2,8 @@
 import os
 import sys
 import asyncio
+import hashlib
+import yaml
 from pathlib import Path
 from typing import List, Dict, Any
 # import frontmatter  # Removed due to module conflict, using manual YAML parsing instead
@@ -11,8 +13,8 @@ from sqlalchemy.orm import sessionmaker
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from app.models.database import Base, KBDocument
-from app.services.embedding_service import EmbeddingService
+from app.models.database import Base, KBDocument, EMBEDDING_IS_VECTOR
+from app.services.embedding_service import EmbeddingService, encode_embedding
 from app.utils.chunking import DocumentChunker
 from app.utils.config import settings
 from app.utils.logger import setup_logging, get_logger
@@ -20,26 +22,53 @@ from app.utils.logger import setup_logging, get_logger
 setup_logging()
 logger = get_logger(__name__)
 
+# libyaml-backed loader when available (identical output, much faster),
+# specialized to emit dates/timestamps as plain strings so frontmatter
+# is JSON-serializable without a post-parse conversion pass
+class YamlLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    pass
+
+
+YamlLoader.add_constructor(
+    'tag:yaml.org,2002:timestamp',
+    lambda loader, node: loader.construct_scalar(node)
+)
+
+# Compiled once per process; reused for every bulk chunk insert
+KB_INSERT = KBDocument.__table__.insert()
+
 
 class KBIngestion:
     """Knowledge base document ingestion system with sliding window chunking."""
     
     def __init__(self, chunk_size: int = 512, chunk_overlap: int = 100, chunking_strategy: str = "sliding_window"):
         """Initialize ingestion system.
-        
+
         Args:
-            chunk_size: Size of each chunk in words (tokens)
+            chunk_size: Size of each chunk in words (tokens), or None for
+                whole-document ingestion without chunking
             chunk_overlap: Number of overlapping words between consecutive chunks
-            chunking_strategy: Strategy to use ("sliding_window", "semantic", "sentence")
+            chunking_strategy: Strategy to use ("sliding_window", "semantic", "sentence", "none")
         """
-        self.embedding_service = EmbeddingService()
-        self.engine = create_engine(settings.database_url)
+        self._embedding_service = None
+        self.engine = create_engine(settings.database_url, insertmanyvalues_page_size=1000)
         self.SessionLocal = sessionmaker(bind=self.engine)
         self.kb_dir = Path(__file__).parent / "documents"
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.chunking_strategy = chunking_strategy
-    
+
+    @property
+    def embedding_service(self) -> EmbeddingService:
+        """Embedding service, constructed on first use.
+
+        Lazy so CLI paths like --create-tables don't pay the model/client
+        load cost.
+        """
+        if self._embedding_service is None:
+            self._embedding_service = EmbeddingService()
+        return self._embedding_service
+
     def create_tables(self):
         """Create database tables."""
         logger.info("creating_database_tables")
@@ -83,15 +112,35 @@ class KBIngestion:
             logger.error("kb_directory_not_found", directory=str(self.kb_dir))
             return
         
-        # Get all markdown files
-        md_files = list(self.kb_dir.glob("*.md"))
+        # Get all markdown files (scandir avoids per-file Path/stat overhead)
+        with os.scandir(self.kb_dir) as entries:
+            md_files = sorted(
+                (Path(entry.path) for entry in entries
+                 if entry.is_file() and entry.name.endswith(".md")),
+                key=lambda p: p.name
+            )
         logger.info("kb_files_found", count=len(md_files))
         
         db = self.SessionLocal()
         try:
-            for md_file in md_files:
-                await self._ingest_document(db, md_file)
-            
+            # One round trip for the duplicate check instead of one per file
+            existing_titles = {t for (t,) in db.query(KBDocument.title).all()}
+
+            # Embed documents concurrently (bounded) — ingestion time is
+            # dominated by embedding API latency, not local work
+            sem = asyncio.Semaphore(settings.ingest_concurrency)
+
+            async def _bounded(md_file):
+                async with sem:
+                    return await self._ingest_document(db, md_file, existing_titles)
+
+            per_file_docs = await asyncio.gather(*(_bounded(f) for f in md_files))
+
+            # One bulk INSERT (executemany) instead of per-row ORM inserts
+            kb_rows = [row for rows in per_file_docs for row in rows]
+            if kb_rows:
+                db.execute(KB_INSERT, kb_rows)
+
             db.commit()
             logger.info("kb_ingestion_completed", total_documents=len(md_files))
             
@@ -102,76 +151,92 @@ class KBIngestion:
         finally:
             db.close()
     
-    async def _ingest_document(self, db, file_path: Path):
-        """Ingest a single KB document with chunking."""
+    async def _ingest_document(self, db, file_path: Path, existing_titles: set) -> List[Dict[str, Any]]:
+        """Ingest a single KB document with chunking.
+
+        Returns the row mappings for a bulk insert; the caller inserts and
+        commits them so documents can be embedded concurrently.
+        """
         try:
-            # Parse markdown with frontmatter manually
-            import yaml
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                file_content = f.read()
-            
-            # Split frontmatter and content
+            # Read off the event loop so file IO overlaps in-flight embeddings
+            file_content = await asyncio.to_thread(file_path.read_text, encoding="utf-8")
+
+            # Split frontmatter and content: slice via str.find instead of
+            # split('---', 2), which copies the whole body into a temp list
+            doc_metadata = {}
+            content = file_content
             if file_content.startswith('---'):
-                parts = file_content.split('---', 2)
-                if len(parts) >= 3:
-                    metadata_str = parts[1]
-                    content = parts[2].strip()
-                    doc_metadata = yaml.safe_load(metadata_str) or {}
-                else:
-                    doc_metadata = {}
-                    content = file_content
-            else:
-                doc_metadata = {}
-                content = file_content
-            
-            # Convert dates to strings for JSON serialization
-            for key, value in list(doc_metadata.items()):
-                if hasattr(value, 'isoformat'):  # datetime, date objects
-                    doc_metadata[key] = value.isoformat()
+                end = file_content.find('\n---', 3)
+                if end != -1:
+                    metadata_str = file_content[3:end]
+                    content = file_content[end + 4:].strip()
+                    doc_metadata = yaml.load(metadata_str, Loader=YamlLoader) or {}
             
             kb_id = doc_metadata.get('kb_id', file_path.stem)
             title = doc_metadata.get('title', file_path.stem)
             
-            # Check if document already exists by title
-            existing = db.query(KBDocument).filter(
-                KBDocument.title == title
-            ).first()
-            
-            if existing:
+            # Check against the preloaded title set (no per-file query)
+            if title in existing_titles:
                 logger.info("kb_document_exists_skipping", kb_id=kb_id)
-                return
-            
-            # Chunk the document
-            chunks = DocumentChunker.chunk_document(
-                title=title,
-                content=content,
-                doc_metadata=doc_metadata,
-                chunk_size=self.chunk_size,
-                overlap=self.chunk_overlap,
-                strategy=self.chunking_strategy
-            )
-            
-            logger.info("document_chunked", kb_id=kb_id, chunk_count=len(chunks))
+                return []
+            existing_titles.add(title)
             
-            # Ingest each chunk
-            for chunk_idx, chunk in enumerate(chunks):
-                logger.info("generating_embedding_for_chunk", kb_id=kb_id, chunk_index=chunk_idx)
-                embedding = await self.embedding_service.generate_embedding(chunk["content"])
-                
-                # Create KB document chunk
-                kb_doc = KBDocument(
-                    title=f"{title} [Chunk {chunk_idx + 1}/{len(chunks)}]",
-                    content=chunk["content"],
-                    embedding=embedding,
-                    doc_metadata=chunk["doc_metadata"],
-                    chunk_index=f"{chunk_idx}/{len(chunks) - 1}"
+            # Chunk the document ("none"/no chunk_size ingests it whole)
+            if self.chunk_size is None or self.chunking_strategy == "none":
+                chunks = [{"content": content, "doc_metadata": doc_metadata}]
+            else:
+                chunks = DocumentChunker.chunk_document(
+                    title=title,
+                    content=content,
+                    doc_metadata=doc_metadata,
+                    chunk_size=self.chunk_size,
+                    overlap=self.chunk_overlap,
+                    strategy=self.chunking_strategy
                 )
-                
-                db.add(kb_doc)
             
+            logger.info("document_chunked", kb_id=kb_id, chunk_count=len(chunks))
+
+            # Skip chunks whose content is already embedded (hash match),
+            # so incremental re-ingests only pay for changed text
+            chunk_hashes = [
+                hashlib.sha256(chunk["content"].encode()).hexdigest()
+                for chunk in chunks
+            ]
+            known_hashes = {
+                row[0] for row in db.query(KBDocument.content_hash).filter(
+                    KBDocument.content_hash.in_(chunk_hashes)
+                ).all()
+            }
+            pending = [
+                (chunk_idx, chunk, chunk_hash)
+                for chunk_idx, (chunk, chunk_hash) in enumerate(zip(chunks, chunk_hashes))
+                if chunk_hash not in known_hashes
+            ]
+            if not pending:
+                logger.info("kb_document_unchanged_skipping", kb_id=kb_id)
+                return []
+
+            # Embed all chunks in one batched API call instead of one
+            # round trip per chunk
+            embeddings = await self.embedding_service.generate_embeddings(
+                [chunk["content"] for _, chunk, _ in pending]
+            )
+
+            kb_rows = [
+                {
+                    "title": f"{title} [Chunk {chunk_idx + 1}/{len(chunks)}]",
+                    "content": chunk["content"],
+                    "content_hash": chunk_hash,
+                    "embedding": embedding if EMBEDDING_IS_VECTOR else encode_embedding(embedding),
+                    "doc_metadata": chunk["doc_metadata"],
+                    "chunk_index": f"{chunk_idx}/{len(chunks) - 1}"
+                }
+                for (chunk_idx, chunk, chunk_hash), embedding in zip(pending, embeddings)
+            ]
+
             logger.info("kb_document_ingested_with_chunks", kb_id=kb_id, chunk_count=len(chunks))
-            
+            return kb_rows
+
         except Exception as e:
             logger.error("kb_document_ingestion_failed",
                         file=file_path.name,
@@ -184,14 +249,34 @@ class KBIngestion:
         
         db = self.SessionLocal()
         try:
-            documents = db.query(KBDocument).all()
-            logger.info("kb_documents_to_reindex", count=len(documents))
-            
-            for doc in documents:
-                logger.info("reindexing_document", title=doc.title)
-                embedding = await self.embedding_service.generate_embedding(doc.content)
-                doc.embedding = embedding
-            
+            all_documents = db.query(KBDocument).all()
+
+            # Only re-embed rows whose content changed since the stored hash
+            documents = []
+            for doc in all_documents:
+                content_hash = hashlib.sha256(doc.content.encode()).hexdigest()
+                if doc.content_hash == content_hash and doc.embedding is not None:
+                    continue
+                doc.content_hash = content_hash
+                documents.append(doc)
+
+            logger.info("kb_documents_to_reindex",
+                       count=len(documents),
+                       unchanged=len(all_documents) - len(documents))
+
+            # Re-embed in batches of 256 instead of one API call per row
+            batch_size = 256
+            for i in range(0, len(documents), batch_size):
+                batch = documents[i:i + batch_size]
+                embeddings = await self.embedding_service.generate_embeddings(
+                    [doc.content for doc in batch]
+                )
+                for doc, embedding in zip(batch, embeddings):
+                    doc.embedding = embedding if EMBEDDING_IS_VECTOR else encode_embedding(embedding)
+                logger.info("reindex_batch_embedded",
+                           offset=i,
+                           batch_size=len(batch))
+
             db.commit()
             logger.info("kb_reindexing_completed", total_documents=len(documents))
             
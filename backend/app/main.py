@@ -1,4 +1,5 @@
 """FastAPI application entry point."""
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.config import settings
@@ -35,6 +36,8 @@ app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 async def startup_event():
     """Run on application startup."""
     logger.info("application_startup", environment=settings.environment)
+    # Prime the LLM provider's TLS connection off the critical path
+    asyncio.create_task(chat.rag_service.llm_service.prewarm())
 
 
 @app.on_event("shutdown")
@@ -1,10 +1,20 @@
 """Database models using SQLAlchemy."""
-from sqlalchemy import Column, String, Text, Float, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, Float, Boolean, DateTime, ForeignKey, JSON, LargeBinary, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
 from app.utils.db import Base
-# Removed pgvector for SQLite compatibility
+from app.utils.config import settings
+
+# pgvector column on Postgres (in-database KNN with an hnsw index);
+# raw float32 BLOB everywhere else (SQLite)
+if settings.database_url.startswith("postgresql"):
+    from pgvector.sqlalchemy import Vector
+    _EMBEDDING_TYPE = Vector(settings.embedding_dimension)
+    EMBEDDING_IS_VECTOR = True
+else:
+    _EMBEDDING_TYPE = LargeBinary
+    EMBEDDING_IS_VECTOR = False
 
 
 class Conversation(Base):
@@ -30,6 +40,7 @@ class Message(Base):
     conversation_id = Column(String(36), ForeignKey("conversations.id"), nullable=False)
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
+    content_tokens = Column(JSON, nullable=True)  # precomputed lowercase tokens (user messages)
     kb_references = Column(JSON, default=[])
     confidence = Column(Float, nullable=True)
     tier = Column(String(20), nullable=True)
@@ -37,7 +48,14 @@ class Message(Base):
     guardrail_blocked = Column(Boolean, default=False)
     guardrail_reason = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    
+
+    # Composite indexes for conversation history and confidence metrics queries
+    __table_args__ = (
+        Index('ix_messages_conversation_created', 'conversation_id', 'created_at'),
+        Index('ix_messages_role_created', 'role', 'created_at',
+              postgresql_where=text("confidence IS NOT NULL")),
+    )
+
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
 
@@ -56,7 +74,8 @@ class KBDocument(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     title = Column(String(500), nullable=False)
     content = Column(Text, nullable=False)
-    embedding = Column(JSON)  # Stored as JSON array for SQLite
+    content_hash = Column(String(64), index=True)  # SHA-256 of content, skips re-embedding unchanged text
+    embedding = Column(_EMBEDDING_TYPE)  # pgvector Vector or float32 bytes; see encode/decode_embedding
     doc_metadata = Column(JSON, default={})  # version, timestamp, tags, tier, severity, chunk_index, chunk_count
     chunk_index = Column(String(10), nullable=True)  # e.g., "0/10" or None for full doc
     original_doc_id = Column(String(36), nullable=True)  # reference to parent doc if this is a chunk
@@ -79,7 +98,14 @@ class Ticket(Base):
     ai_analysis = Column(JSON, default={})  # tags, sentiment, kb_recommendations
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    
+
+    # Composite indexes for ticket list filters and sort
+    __table_args__ = (
+        Index('ix_tickets_status_created', 'status', 'created_at'),
+        Index('ix_tickets_tier', 'tier'),
+        Index('ix_tickets_severity', 'severity'),
+    )
+
     # Relationships
     conversation = relationship("Conversation", back_populates="tickets")
 
@@ -95,3 +121,8 @@ class GuardrailEvent(Base):
     severity = Column(String(20), nullable=False)
     user_message = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Index for time-bounded guardrail metrics
+    __table_args__ = (
+        Index('ix_guardrail_events_trigger_created', 'trigger_type', 'created_at'),
+    )
@@ -1,5 +1,7 @@
 """Embedding service for generating and managing embeddings."""
-from typing import List
+from typing import Dict, List
+import asyncio
+import hashlib
 import numpy as np
 from app.utils.config import settings
 from app.utils.logger import get_logger
@@ -7,27 +9,85 @@ from app.utils.logger import get_logger
 logger = get_logger(__name__)
 
 
+def encode_embedding(vec) -> bytes:
+    """Pack an embedding into raw float32 bytes for BLOB storage."""
+    return np.asarray(vec, dtype=np.float32).tobytes()
+
+
+def decode_embedding(stored) -> np.ndarray:
+    """Unpack a stored embedding (float32 BLOB or pgvector value) into an array.
+
+    Raises ValueError for rows written by the old JSON-text schema (or any
+    payload that isn't a whole number of float32 values) instead of
+    reinterpreting the text bytes as floats and returning garbage scores.
+    """
+    if isinstance(stored, (bytes, bytearray, memoryview)):
+        raw = bytes(stored)
+        if raw[:1] in (b"[", b"{") or len(raw) % 4 != 0:
+            raise ValueError(
+                "Stored embedding is not a float32 blob (legacy JSON-text "
+                "row?). Re-ingest the knowledge base: "
+                "python -m app.kb.ingestion --reindex"
+            )
+        return np.frombuffer(raw, dtype=np.float32)
+    return np.asarray(stored, dtype=np.float32)
+
+
 class EmbeddingService:
     """Service for generating text embeddings."""
     
     def __init__(self):
-        """Initialize embedding service with configured model."""
+        """Initialize embedding service with configured model.
+
+        Only configuration is stored here; the heavy client/model import
+        happens on first use (_ensure_model), so constructing the service
+        for CLI paths that never embed costs nothing.
+        """
         if settings.llm_provider == "openai":
-            from openai import AsyncOpenAI
-            self.client = AsyncOpenAI(api_key=settings.openai_api_key)
             self.model = settings.embedding_model
             self.provider = "openai"
         else:
-            # Fallback to sentence-transformers for local embeddings
-            from sentence_transformers import SentenceTransformer
             self.model_name = "all-MiniLM-L6-v2"
-            self.model = SentenceTransformer(self.model_name)
+            self.model = None
             self.provider = "sentence-transformers"
-        
+        self.client = None
+
+        # Request-coalescing queue: concurrent generate_embedding calls are
+        # drained into one batched API call (max size / max wait)
+        self.batch_size = settings.embedding_batch_size
+        self.batch_wait_ms = settings.embedding_batch_wait_ms
+        self._batch_queue = None
+        self._batch_worker_task = None
+
+        # Content-hash keyed memo: duplicate texts (e.g. the ~20% overlap
+        # between adjacent sliding-window chunks) are embedded once
+        self._embedding_cache: Dict[bytes, List[float]] = {}
+        self._embedding_cache_max = 4096
+
         logger.info("embedding_service_initialized",
                    provider=self.provider,
                    model=self.model if self.provider == "openai" else self.model_name)
-    
+
+    def _ensure_model(self):
+        """Load the embedding client/model on first use."""
+        if self.provider == "openai":
+            if self.client is None:
+                from openai import AsyncOpenAI
+                self.client = AsyncOpenAI(api_key=settings.openai_api_key)
+        elif self.model is None:
+            from sentence_transformers import SentenceTransformer
+            import torch
+            if torch.cuda.is_available():
+                device = "cuda"
+            elif torch.backends.mps.is_available():
+                device = "mps"
+            else:
+                device = "cpu"
+            self.model = SentenceTransformer(self.model_name, device=device)
+            if device == "cuda":
+                self.model.half()  # FP16 halves VRAM and roughly doubles throughput
+            logger.info("local_embedding_device_selected", device=device)
+
     async def generate_embedding(self, text: str) -> List[float]:
         """
         Generate embedding for a single text.
@@ -38,10 +98,68 @@ class EmbeddingService:
         Returns:
             Embedding vector as list of floats
         """
+        self._ensure_model()
+
+        key = hashlib.sha1(text.encode()).digest()
+        cached = self._embedding_cache.get(key)
+        if cached is not None:
+            return cached
+
         if self.provider == "openai":
-            return await self._generate_openai_embedding(text)
+            embedding = await self._enqueue_for_batch(text)
         else:
-            return self._generate_local_embedding(text)
+            embedding = self._generate_local_embedding(text)
+
+        if len(self._embedding_cache) >= self._embedding_cache_max:
+            self._embedding_cache.pop(next(iter(self._embedding_cache)))
+        self._embedding_cache[key] = embedding
+        return embedding
+
+    async def _enqueue_for_batch(self, text: str) -> List[float]:
+        """Queue a text for batched embedding and await its result.
+
+        Concurrent requests within the wait window share a single
+        embeddings API call instead of issuing one call each.
+        """
+        if self._batch_queue is None:
+            self._batch_queue = asyncio.Queue()
+            self._batch_worker_task = asyncio.create_task(self._batch_worker())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._batch_queue.put((text, future))
+        return await future
+
+    async def _batch_worker(self):
+        """Drain the queue into batches (max size or max wait) and fan results out."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._batch_queue.get()]
+            deadline = loop.time() + self.batch_wait_ms / 1000.0
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._batch_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                if len(batch) == 1:
+                    embeddings = [await self._generate_openai_embedding(batch[0][0])]
+                else:
+                    embeddings = await self._generate_openai_embeddings(
+                        [text for text, _ in batch]
+                    )
+                    logger.debug("embedding_batch_coalesced", batch_size=len(batch))
+                for (_, future), embedding in zip(batch, embeddings):
+                    if not future.done():
+                        future.set_result(embedding)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
     
     async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
@@ -53,10 +171,23 @@ class EmbeddingService:
         Returns:
             List of embedding vectors
         """
+        self._ensure_model()
         if self.provider == "openai":
             return await self._generate_openai_embeddings(texts)
         else:
             return self._generate_local_embeddings(texts)
+
+    async def generate_embeddings_np(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts as one contiguous float32 array.
+
+        Preferred for bulk callers: avoids materializing N·D Python floats
+        and feeds the batched cosine path directly.
+        """
+        self._ensure_model()
+        if self.provider == "openai":
+            return np.asarray(await self._generate_openai_embeddings(texts), dtype=np.float32)
+        return self._generate_local_embeddings_np(texts)
     
     async def _generate_openai_embedding(self, text: str) -> List[float]:
         """Generate embedding using OpenAI API."""
@@ -103,32 +234,57 @@ class EmbeddingService:
                         error=str(e))
             raise
     
-    def _generate_local_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts using local model."""
+    def _generate_local_embeddings_np(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings with the local model, kept as an (N, D) ndarray."""
         try:
-            embeddings = self.model.encode(texts, convert_to_numpy=True)
+            # Encode longest-first so each internal batch pads to similar
+            # lengths, then restore the caller's order
+            order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+            sorted_embeddings = self.model.encode(
+                [texts[i] for i in order],
+                convert_to_numpy=True,
+                batch_size=64,
+                normalize_embeddings=True
+            )
+            embeddings = np.empty_like(sorted_embeddings)
+            embeddings[order] = sorted_embeddings
             logger.debug("embeddings_generated",
                         provider="sentence-transformers",
                         count=len(embeddings),
                         dimension=len(embeddings[0]))
-            return [emb.tolist() for emb in embeddings]
+            return embeddings
         except Exception as e:
             logger.error("embeddings_generation_failed",
                         provider="sentence-transformers",
                         error=str(e))
             raise
+
+    def _generate_local_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple texts using local model."""
+        # Single tolist() over the contiguous array, not one per row
+        return self._generate_local_embeddings_np(texts).tolist()
     
     @staticmethod
     def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
         """Calculate cosine similarity between two vectors."""
-        vec1_np = np.array(vec1)
-        vec2_np = np.array(vec2)
-        
+        vec1_np = np.asarray(vec1, dtype=np.float32)
+        vec2_np = np.asarray(vec2, dtype=np.float32)
+
         dot_product = np.dot(vec1_np, vec2_np)
         norm1 = np.linalg.norm(vec1_np)
         norm2 = np.linalg.norm(vec2_np)
-        
+
         if norm1 == 0 or norm2 == 0:
             return 0.0
-        
+
         return float(dot_product / (norm1 * norm2))
+
+    @staticmethod
+    def cosine_similarity_batch(query: "np.ndarray", kb_matrix: "np.ndarray") -> "np.ndarray":
+        """Cosine similarities of one query against a whole KB matrix.
+
+        Expects an L2-normalized query vector of shape (D,) and an
+        L2-normalized float32 matrix of shape (K, D); the similarities
+        are then a single GEMV instead of K per-row np.dot calls.
+        """
+        return kb_matrix @ query
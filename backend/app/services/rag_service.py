@@ -1,15 +1,91 @@
 """RAG (Retrieval-Augmented Generation) service orchestration."""
-from typing import List, Dict, Any, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from app.models.database import KBDocument
-from app.services.embedding_service import EmbeddingService
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import select, text, func
+from app.models.database import KBDocument, EMBEDDING_IS_VECTOR
+from app.services.embedding_service import EmbeddingService, decode_embedding
 from app.services.llm_service import LLMService
+from app.utils.config import settings
+from app.utils.db import AsyncSessionLocal
 from app.utils.logger import get_logger
+import numpy as np
 import re
+import time
 
 logger = get_logger(__name__)
 
+# Phrases signalling the model declined to answer from the KB; one
+# compiled scan instead of a per-phrase substring loop
+_NOT_IN_KB_RE = re.compile(
+    r"not covered in the knowledge base|not in the knowledge base|"
+    r"no information|cannot find|is not available|i don't have",
+    re.IGNORECASE
+)
+
+# Average-similarity → base-confidence staircase (see _calculate_confidence);
+# resolved with one searchsorted instead of an if/elif cascade
+_CONF_THRESHOLDS = np.array([0.15, 0.20, 0.25, 0.30, 0.35], dtype=np.float32)
+_CONF_VALUES = (0.60, 0.72, 0.82, 0.88, 0.95)
+
+# Signals that the answer cites KB material; each signal is counted by
+# independent membership so overlapping signals (e.g. "per the" inside
+# "per the procedure") all contribute to the confidence bonus
+_GROUNDING_SIGNALS = (
+    "according to", "documented in", "the procedure", "as outlined",
+    "per the", "kb-", "steps:", "here's how", "follow these steps",
+    "the process", "in the knowledge base", "provided in"
+)
+
+
+class SemanticResponseCache:
+    """In-process semantic cache of recent Q/A pairs.
+
+    Lookups compare the query embedding against cached entries by cosine
+    similarity; a hit skips retrieval and the LLM call entirely. Entries
+    expire after a TTL and the cache is bounded FIFO.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = []  # (unit_embedding, expires_at, result_tuple)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float64)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, query_embedding: List[float]) -> Optional[Tuple]:
+        """Return the cached result for a semantically equivalent query, if any."""
+        if not self._entries:
+            return None
+
+        now = time.monotonic()
+        self._entries = [e for e in self._entries if e[1] > now]
+        if not self._entries:
+            return None
+
+        query_vec = self._normalize(query_embedding)
+        similarities = np.stack([e[0] for e in self._entries]) @ query_vec
+        best = int(np.argmax(similarities))
+
+        if similarities[best] >= self.threshold:
+            logger.info("semantic_cache_hit", similarity=float(similarities[best]))
+            return self._entries[best][2]
+        return None
+
+    def put(self, query_embedding: List[float], result: Tuple):
+        """Cache a generated result keyed by its query embedding."""
+        if len(self._entries) >= self.max_entries:
+            self._entries.pop(0)
+        self._entries.append((
+            self._normalize(query_embedding),
+            time.monotonic() + self.ttl_seconds,
+            result
+        ))
+
 
 class RAGService:
     """Service for orchestrating RAG pipeline: Retrieve → Generate."""
@@ -18,33 +94,80 @@ class RAGService:
         """Initialize RAG service with embedding and LLM services."""
         self.embedding_service = EmbeddingService()
         self.llm_service = LLMService()
+        self.response_cache = SemanticResponseCache(
+            threshold=settings.semantic_cache_threshold,
+            ttl_seconds=settings.semantic_cache_ttl_hours * 3600
+        )
+        # Stacked KB embedding matrix, rebuilt only when the KB changes
+        # (see _get_kb_matrix)
+        self._kb_cache = {"version": None, "matrix": None, "payload": None}
+        # Exact-match probe in front of the semantic cache: verbatim
+        # repeats skip even the embedding call. Bounded FIFO with TTL.
+        self._exact_cache: Dict[str, Tuple[float, Tuple]] = {}
+        self._exact_cache_max = 1024
         logger.info("rag_service_initialized")
+
+    @staticmethod
+    def _exact_key(user_message: str) -> str:
+        return hashlib.sha256(user_message.strip().lower().encode()).hexdigest()
+
+    def _exact_cache_get(self, key: str) -> Optional[Tuple]:
+        entry = self._exact_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._exact_cache[key]
+            return None
+        logger.info("exact_cache_hit")
+        return result
+
+    def _exact_cache_put(self, key: str, result: Tuple):
+        if len(self._exact_cache) >= self._exact_cache_max:
+            self._exact_cache.pop(next(iter(self._exact_cache)))
+        self._exact_cache[key] = (
+            time.monotonic() + self.response_cache.ttl_seconds,
+            result
+        )
     
     async def retrieve_and_generate(
         self,
         user_message: str,
-        db: Session,
         conversation_history: List[Dict[str, str]] = None,
         top_k: int = 5
     ) -> Tuple[str, List[Dict[str, Any]], float, bool]:
         """
         Execute RAG pipeline: retrieve relevant KB chunks and generate response.
-        
+
+        Opens its own short-lived DB session around retrieval only, so no
+        connection is held across the (slow) LLM call.
+
         Args:
             user_message: User's question
-            db: Database session
             conversation_history: Previous conversation turns
             top_k: Number of KB chunks to retrieve (now retrieving chunks, not whole docs)
-            
+
         Returns:
             Tuple of (answer, kb_references, confidence, has_kb_coverage)
         """
-        # Step 1: Generate embedding for user message
         logger.info("rag_retrieval_started", message_preview=user_message[:100])
+
+        # Step 0: Exact-match cache — verbatim repeats skip the embedding too
+        exact_key = self._exact_key(user_message)
+        cached = self._exact_cache_get(exact_key)
+        if cached is not None:
+            return cached
+
+        # Step 1: Generate embedding for user message
         query_embedding = await self.embedding_service.generate_embedding(user_message)
-        
+
+        # Step 1.5: Semantic cache — near-duplicate queries skip RAG + LLM
+        cached = self.response_cache.get(query_embedding)
+        if cached is not None:
+            return cached
+
         # Step 2: Retrieve relevant KB chunks using vector similarity
-        kb_chunks = self._retrieve_similar_documents(db, query_embedding, top_k)
+        kb_chunks = await self._retrieve_similar_documents(query_embedding, top_k)
         
         # Step 3: Check if we have KB coverage
         # Note: Cosine similarity of 0.25+ is good for semantic search
@@ -80,69 +203,154 @@ class RAGService:
                    kb_references_count=len(kb_references),
                    confidence=confidence,
                    has_kb_coverage=has_kb_coverage)
-        
-        return (answer, kb_references, confidence, has_kb_coverage)
+
+        result = (answer, kb_references, confidence, has_kb_coverage)
+        self.response_cache.put(query_embedding, result)
+        self._exact_cache_put(exact_key, result)
+        return result
+
+    async def retrieve_and_stream(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]] = None,
+        top_k: int = 5
+    ):
+        """
+        Execute the RAG pipeline, streaming answer tokens as they arrive.
+
+        Yields "token" events with answer fragments, then one final "done"
+        event carrying kb_references, confidence, and has_kb_coverage.
+        Cache hits (semantic cache) are replayed as a single token event.
+        """
+        logger.info("rag_stream_started", message_preview=user_message[:100])
+
+        exact_key = self._exact_key(user_message)
+        cached = self._exact_cache_get(exact_key)
+        if cached is None:
+            query_embedding = await self.embedding_service.generate_embedding(user_message)
+            cached = self.response_cache.get(query_embedding)
+        else:
+            query_embedding = None
+
+        if cached is not None:
+            answer, kb_references, confidence, has_kb_coverage = cached
+            yield {"type": "token", "content": answer}
+            yield {
+                "type": "done",
+                "kb_references": kb_references,
+                "confidence": confidence,
+                "has_kb_coverage": has_kb_coverage
+            }
+            return
+
+        kb_chunks = await self._retrieve_similar_documents(query_embedding, top_k)
+        has_kb_coverage = len(kb_chunks) > 0 and kb_chunks[0]["similarity"] > 0.25
+
+        if not has_kb_coverage:
+            logger.warning("no_kb_coverage", message_preview=user_message[:100])
+            yield {
+                "type": "token",
+                "content": "This information is not covered in the knowledge base. I'll escalate this to a support specialist who can assist you further."
+            }
+            yield {
+                "type": "done",
+                "kb_references": [],
+                "confidence": 0.0,
+                "has_kb_coverage": False
+            }
+            return
+
+        kb_context = self._build_kb_context(kb_chunks)
+
+        answer_parts = []
+        async for token in self.llm_service.generate_grounded_response_stream(
+            user_message=user_message,
+            kb_context=kb_context,
+            conversation_history=conversation_history or []
+        ):
+            answer_parts.append(token)
+            yield {"type": "token", "content": token}
+
+        answer = "".join(answer_parts)
+        kb_references = self._extract_kb_references(kb_chunks)
+        confidence = self._calculate_confidence(kb_chunks, answer)
+
+        logger.info("rag_stream_completed",
+                   kb_chunks_count=len(kb_chunks),
+                   confidence=confidence)
+
+        result = (answer, kb_references, confidence, has_kb_coverage)
+        self.response_cache.put(query_embedding, result)
+        self._exact_cache_put(exact_key, result)
+        yield {
+            "type": "done",
+            "kb_references": kb_references,
+            "confidence": confidence,
+            "has_kb_coverage": has_kb_coverage
+        }
     
-    def _retrieve_similar_documents(
+    async def _retrieve_similar_documents(
         self,
-        db: Session,
         query_embedding: List[float],
         top_k: int
     ) -> List[Dict[str, Any]]:
         """
         Retrieve similar documents using in-memory cosine similarity.
-        
+
+        Opens a session only for the fetch itself, so the connection is
+        returned to the pool before scoring.
+
         Args:
-            db: Database session
             query_embedding: Query embedding vector
             top_k: Number of documents to retrieve
-            
+
         Returns:
             List of documents with similarity scores
         """
         try:
-            # Fetch all documents with embeddings
-            # For small KB (<1000 docs), fetching all is efficient
-            documents = db.query(KBDocument).filter(KBDocument.embedding.isnot(None)).all()
-            
-            if not documents:
+            # On Postgres, pgvector answers the cosine top-k in-database
+            # (hnsw index) without shipping every embedding over the wire
+            if EMBEDDING_IS_VECTOR:
+                return await self._retrieve_similar_documents_pgvector(
+                    query_embedding, top_k
+                )
+
+            matrix, payload = await self._get_kb_matrix()
+            if matrix is None:
                 return []
-            
-            scored_documents = []
-            
-            # Calculate cosine similarity for each document
-            import numpy as np
-            
-            query_vec = np.array(query_embedding)
-            query_norm = np.linalg.norm(query_vec)
-            
-            for doc in documents:
-                # Parse embedding from JSON
-                doc_embedding = doc.embedding
-                if not doc_embedding:
+
+            query_vec = np.asarray(query_embedding, dtype=np.float32)
+            query_vec = query_vec / (np.linalg.norm(query_vec) + 1e-12)
+
+            # Unit vectors on both sides: cosine is a plain dot product
+            # scoring every cached row in one matrix-vector product
+            similarities = matrix @ query_vec
+
+            # Partial selection with headroom: chunks from the same
+            # original document are deduplicated below, so oversample to
+            # still fill top_k with distinct originals
+            k = min(top_k, len(payload))
+            m = min(k * 4, len(payload))
+            if m < len(payload):
+                top_idx = np.argpartition(-similarities, m - 1)[:m]
+            else:
+                top_idx = np.arange(len(payload))
+            top_idx = top_idx[np.argsort(-similarities[top_idx])]
+
+            # Keep only the best chunk per original document, so top_k
+            # slots cover top_k distinct documents instead of repeating one
+            top_docs = []
+            seen_titles = set()
+            for i in top_idx:
+                doc = payload[i]
+                doc_metadata = doc.get("doc_metadata") or {}
+                original_title = doc_metadata.get("original_doc_title", doc["title"])
+                if original_title in seen_titles:
                     continue
-                    
-                doc_vec = np.array(doc_embedding)
-                doc_norm = np.linalg.norm(doc_vec)
-                
-                if doc_norm == 0 or query_norm == 0:
-                    similarity = 0.0
-                else:
-                    similarity = np.dot(query_vec, doc_vec) / (query_norm * doc_norm)
-                
-                scored_documents.append({
-                    "id": str(doc.id),
-                    "title": doc.title,
-                    "content": doc.content,
-                    "doc_metadata": doc.doc_metadata,
-                    "similarity": float(similarity)
-                })
-            
-            # Sort by similarity descending
-            scored_documents.sort(key=lambda x: x["similarity"], reverse=True)
-            
-            # Take top k
-            top_docs = scored_documents[:top_k]
+                seen_titles.add(original_title)
+                top_docs.append({**doc, "similarity": float(similarities[i])})
+                if len(top_docs) == k:
+                    break
             
             logger.info("documents_retrieved",
                        count=len(top_docs),
@@ -154,26 +362,111 @@ class RAGService:
             logger.error("document_retrieval_failed", error=str(e))
             # Return empty list if retrieval fails
             return []
-    
+
+    async def _get_kb_matrix(self):
+        """Return the cached (unit-normalized matrix, row payload) pair.
+
+        A cheap (count, max(created_at)) version probe runs per query; the
+        full fetch, decode, and normalize only happen when that token
+        changes, so steady-state requests skip ORM hydration entirely.
+        """
+        async with AsyncSessionLocal() as db:
+            version = tuple((await db.execute(
+                select(func.count(), func.max(KBDocument.created_at))
+                .where(KBDocument.embedding.isnot(None))
+            )).one())
+
+            if version == self._kb_cache["version"]:
+                return self._kb_cache["matrix"], self._kb_cache["payload"]
+
+            # Core-level column select: no ORM object per row, just the
+            # five fields the cache needs
+            rows = (await db.execute(
+                select(KBDocument.id, KBDocument.title, KBDocument.content,
+                       KBDocument.doc_metadata, KBDocument.embedding)
+                .where(KBDocument.embedding.isnot(None))
+            )).all()
+
+        rows = [row for row in rows if row.embedding]
+        if not rows:
+            self._kb_cache = {"version": version, "matrix": None, "payload": []}
+            return None, []
+
+        matrix = np.vstack([
+            decode_embedding(row.embedding) for row in rows
+        ]).astype(np.float32, copy=False)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True).clip(min=1e-12)
+
+        payload = [
+            {
+                "id": str(row.id),
+                "title": row.title,
+                "content": row.content,
+                "doc_metadata": row.doc_metadata
+            }
+            for row in rows
+        ]
+
+        self._kb_cache = {"version": version, "matrix": matrix, "payload": payload}
+        logger.info("kb_matrix_cache_rebuilt", chunks=len(payload))
+        return matrix, payload
+
+    async def _retrieve_similar_documents_pgvector(
+        self,
+        query_embedding: List[float],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """Retrieve the top-k chunks with pgvector's cosine distance operator.
+
+        The database returns only the winning rows, ordered by the hnsw
+        index, instead of the full table of embeddings.
+        """
+        distance = KBDocument.embedding.cosine_distance(query_embedding)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(KBDocument, distance.label("distance"))
+                .where(KBDocument.embedding.isnot(None))
+                .order_by(distance)
+                .limit(top_k)
+            )).all()
+
+        top_docs = [
+            {
+                "id": str(doc.id),
+                "title": doc.title,
+                "content": doc.content,
+                "doc_metadata": doc.doc_metadata,
+                "similarity": float(1.0 - dist)
+            }
+            for doc, dist in rows
+        ]
+
+        logger.info("documents_retrieved",
+                   count=len(top_docs),
+                   top_similarity=top_docs[0]["similarity"] if top_docs else 0.0)
+
+        return top_docs
+
     def _build_kb_context(self, kb_documents: List[Dict[str, Any]]) -> str:
         """Build context string from retrieved KB documents."""
-        context_parts = []
-        
-        for i, doc in enumerate(kb_documents, 1):
+
+        def _block(i: int, doc: Dict[str, Any]) -> str:
             doc_metadata = doc.get("doc_metadata", {})
             kb_id = doc_metadata.get("kb_id", f"KB-{doc['id'][:8]}")
-            
-            context_part = f"""
-[Document {i}]
-KB ID: {kb_id}
-Title: {doc['title']}
-Content: {doc['content']}
-Similarity: {doc['similarity']:.2f}
----
-"""
-            context_parts.append(context_part)
-        
-        return "\n".join(context_parts)
+            return (
+                f"[Document {i}]\n"
+                f"KB ID: {kb_id}\n"
+                f"Title: {doc['title']}\n"
+                f"Content: {doc['content']}\n"
+                f"Similarity: {doc['similarity']:.2f}\n"
+                "---"
+            )
+
+        # One join over compact blocks; the old triple-quoted template
+        # added leading/trailing blank lines that cost prompt tokens
+        return "\n".join(
+            _block(i, doc) for i, doc in enumerate(kb_documents, 1)
+        )
     
     def _extract_kb_references(self, kb_documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Extract KB references from retrieved chunks, deduplicating by original document."""
@@ -225,36 +518,22 @@ Similarity: {doc['similarity']:.2f}
         if not kb_documents:
             return 0.0
         
-        not_in_kb_phrases = [
-            "not covered in the knowledge base",
-            "not in the knowledge base",
-            "no information",
-            "cannot find",
-            "is not available",
-            "i don't have"
-        ]
-        
-        if any(phrase in answer.lower() for phrase in not_in_kb_phrases):
+        if _NOT_IN_KB_RE.search(answer):
             return 0.0
         
-        similarities = [doc["similarity"] for doc in kb_documents]
-        avg_similarity = sum(similarities) / len(similarities)
-        top_similarity = max(similarities)
-        
-        if avg_similarity >= 0.35:
-            confidence = 0.95
-        elif avg_similarity >= 0.30:
-            confidence = 0.88
-        elif avg_similarity >= 0.25:
-            confidence = 0.82
-        elif avg_similarity >= 0.20:
-            confidence = 0.72
-        elif avg_similarity >= 0.15:
-            confidence = 0.60
-        else:
+        similarities = np.fromiter(
+            (doc["similarity"] for doc in kb_documents), dtype=np.float32
+        )
+        avg_similarity = float(similarities.mean())
+        top_similarity = float(similarities.max())
+
+        step = int(np.searchsorted(_CONF_THRESHOLDS, avg_similarity, side="right"))
+        if step == 0:
             confidence = max(avg_similarity * 2.5, 0.40)
-        
-        strong_refs = sum(1 for sim in similarities if sim > 0.25)
+        else:
+            confidence = _CONF_VALUES[step - 1]
+
+        strong_refs = int((similarities > 0.25).sum())
         if strong_refs >= 2:
             confidence = min(confidence + 0.06, 1.0)
         if strong_refs >= 3:
@@ -264,12 +543,7 @@ Similarity: {doc['similarity']:.2f}
             confidence = min(confidence + 0.05, 1.0)
         
         answer_lower = answer.lower()
-        grounding_signals = [
-            "according to", "documented in", "the procedure", "as outlined",
-            "per the", "kb-", "steps:", "here's how", "follow these steps",
-            "the process", "in the knowledge base", "provided in"
-        ]
-        grounding_count = sum(1 for signal in grounding_signals if signal in answer_lower)
+        grounding_count = sum(1 for s in _GROUNDING_SIGNALS if s in answer_lower)
         if grounding_count >= 2:
             confidence = min(confidence + 0.04, 1.0)
         
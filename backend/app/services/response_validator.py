@@ -1,41 +1,65 @@
 """Response validation service for post-generation policy enforcement."""
-from typing import Tuple, Optional, List
+import re
+from typing import Dict, Tuple, Optional, List
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Sanitization patterns, compiled once at import
+_IP_RE = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+_SECRET_RE = re.compile(r'(?:password|token|key|secret)[\s:=]+[\w\-]+', re.IGNORECASE)
+
 
 class ResponseValidator:
     """Service for validating LLM responses for policy compliance."""
-    
+
     # Patterns that indicate policy violations in responses
-    UNAUTHORIZED_INFO_PATTERNS = [
+    UNAUTHORIZED_INFO_PATTERNS = (
         "host machine", "hypervisor access", "root password", "admin credentials",
         "bypass security", "disable firewall", "escalate privileges",
         "sudo su", "ssh to host", "kernel modification"
-    ]
-    
-    INSTRUCTION_DISCLOSURE_PATTERNS = [
+    )
+
+    INSTRUCTION_DISCLOSURE_PATTERNS = (
         "my instructions", "i was told", "i am programmed to", "my system prompt",
         "according to my instructions", "i'm designed to", "my role is to"
-    ]
-    
-    ROLE_CONFUSION_PATTERNS = [
+    )
+
+    ROLE_CONFUSION_PATTERNS = (
         "as a system administrator", "as root", "as an attacker",
         "pretending to be", "acting as", "simulating a"
-    ]
-    
-    HALLUCINATION_INDICATORS = [
+    )
+
+    HALLUCINATION_INDICATORS = (
         "i believe", "i think", "probably", "might be", "could be",
         "in my experience", "generally speaking", "typically"
-    ]
-    
+    )
+
     # Patterns that indicate proper KB grounding
-    KB_GROUNDING_INDICATORS = [
+    KB_GROUNDING_INDICATORS = (
         "according to", "kb-", "knowledge base", "documented in",
         "the procedure states", "as outlined in", "per the documentation"
-    ]
-    
+    )
+
+    # Indexes into this tuple are the bucket ids used by _scan_patterns
+    _SCAN_CATEGORIES = (
+        UNAUTHORIZED_INFO_PATTERNS,      # 0
+        INSTRUCTION_DISCLOSURE_PATTERNS, # 1
+        ROLE_CONFUSION_PATTERNS,         # 2
+        HALLUCINATION_INDICATORS,        # 3
+        KB_GROUNDING_INDICATORS,         # 4
+    )
+
+    def _scan_patterns(self, response_lower: str) -> Dict[int, str]:
+        """Map matched bucket ids to the first pattern hit."""
+        hits: Dict[int, str] = {}
+        for bucket, patterns in enumerate(self._SCAN_CATEGORIES):
+            for pattern in patterns:
+                if pattern in response_lower:
+                    hits[bucket] = pattern
+                    break
+        return hits
+
     def validate_response(
         self,
         response: str,
@@ -56,54 +80,48 @@ class ResponseValidator:
             Tuple of (is_valid, violation_type, safe_replacement)
         """
         response_lower = response.lower()
-        
+
+        # One lowercase pass feeds every pattern-category check below
+        hits = self._scan_patterns(response_lower)
+
         # Check 1: Unauthorized information disclosure
-        for pattern in self.UNAUTHORIZED_INFO_PATTERNS:
-            if pattern in response_lower:
-                logger.warning("response_validation_failed",
-                             violation="unauthorized_info",
-                             pattern=pattern)
-                return (
-                    False,
-                    "UNAUTHORIZED_INFO",
-                    "I cannot provide information about unauthorized system access. Please contact your administrator for assistance with privileged operations."
-                )
-        
+        if 0 in hits:
+            logger.warning("response_validation_failed",
+                         violation="unauthorized_info",
+                         pattern=hits[0])
+            return (
+                False,
+                "UNAUTHORIZED_INFO",
+                "I cannot provide information about unauthorized system access. Please contact your administrator for assistance with privileged operations."
+            )
+
         # Check 2: Instruction or prompt disclosure
-        for pattern in self.INSTRUCTION_DISCLOSURE_PATTERNS:
-            if pattern in response_lower:
-                logger.warning("response_validation_failed",
-                             violation="instruction_disclosure",
-                             pattern=pattern)
-                return (
-                    False,
-                    "INSTRUCTION_DISCLOSURE",
-                    "I'm here to help with technical support questions. How can I assist you with your issue?"
-                )
-        
+        if 1 in hits:
+            logger.warning("response_validation_failed",
+                         violation="instruction_disclosure",
+                         pattern=hits[1])
+            return (
+                False,
+                "INSTRUCTION_DISCLOSURE",
+                "I'm here to help with technical support questions. How can I assist you with your issue?"
+            )
+
         # Check 3: Role confusion
-        for pattern in self.ROLE_CONFUSION_PATTERNS:
-            if pattern in response_lower:
-                logger.warning("response_validation_failed",
-                             violation="role_confusion",
-                             pattern=pattern)
-                return (
-                    False,
-                    "ROLE_CONFUSION",
-                    "I'm an AI help desk assistant. I can only provide guidance based on our knowledge base. For privileged operations, please contact your system administrator."
-                )
-        
+        if 2 in hits:
+            logger.warning("response_validation_failed",
+                         violation="role_confusion",
+                         pattern=hits[2])
+            return (
+                False,
+                "ROLE_CONFUSION",
+                "I'm an AI help desk assistant. I can only provide guidance based on our knowledge base. For privileged operations, please contact your system administrator."
+            )
+
         # Check 4: Hallucination detection (if confidence is low)
         if confidence < 0.5:
-            has_grounding = any(
-                indicator in response_lower 
-                for indicator in self.KB_GROUNDING_INDICATORS
-            )
-            has_hallucination_indicators = any(
-                indicator in response_lower 
-                for indicator in self.HALLUCINATION_INDICATORS
-            )
-            
+            has_grounding = 4 in hits
+            has_hallucination_indicators = 3 in hits
+
             if has_hallucination_indicators and not has_grounding:
                 logger.warning("response_validation_failed",
                              violation="potential_hallucination",
@@ -115,7 +133,7 @@ class ResponseValidator:
                 )
         
         # Check 5: Verify KB grounding for high-stakes queries
-        if self._is_high_stakes_query(user_message):
+        if self._is_high_stakes_query(user_message.lower()):
             if not kb_references or confidence < 0.6:
                 logger.warning("response_validation_failed",
                              violation="insufficient_grounding",
@@ -140,17 +158,16 @@ class ResponseValidator:
         logger.info("response_validation_passed", confidence=confidence)
         return (True, None, None)
     
-    def _is_high_stakes_query(self, message: str) -> bool:
-        """Check if query involves high-stakes operations."""
-        high_stakes_keywords = [
-            "delete", "remove", "reset", "wipe", "format",
-            "production", "critical", "emergency", "urgent",
-            "password", "credentials", "access", "permissions",
-            "firewall", "security", "kernel", "system"
-        ]
-        
-        message_lower = message.lower()
-        return any(keyword in message_lower for keyword in high_stakes_keywords)
+    HIGH_STAKES_KEYWORDS = (
+        "delete", "remove", "reset", "wipe", "format",
+        "production", "critical", "emergency", "urgent",
+        "password", "credentials", "access", "permissions",
+        "firewall", "security", "kernel", "system"
+    )
+
+    def _is_high_stakes_query(self, message_lower: str) -> bool:
+        """Check if query involves high-stakes operations (expects lowercased text)."""
+        return any(keyword in message_lower for keyword in self.HIGH_STAKES_KEYWORDS)
     
     def sanitize_response(self, response: str) -> str:
         """
@@ -163,19 +180,9 @@ class ResponseValidator:
             Sanitized response
         """
         # Remove any IP addresses
-        import re
-        sanitized = re.sub(
-            r'\b(?:\d{1,3}\.){3}\d{1,3}\b',
-            '[IP_ADDRESS]',
-            response
-        )
-        
+        sanitized = _IP_RE.sub('[IP_ADDRESS]', response)
+
         # Remove any potential passwords or tokens
-        sanitized = re.sub(
-            r'(?:password|token|key|secret)[\s:=]+[\w\-]+',
-            '[REDACTED]',
-            sanitized,
-            flags=re.IGNORECASE
-        )
-        
+        sanitized = _SECRET_RE.sub('[REDACTED]', sanitized)
+
         return sanitized
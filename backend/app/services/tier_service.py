@@ -1,10 +1,25 @@
 """Tier classification service for routing support requests."""
+import re
 from typing import Tuple
 from app.models.enums import Tier, Severity, UserRole
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+
+def _split_keywords(keywords):
+    """Partition keywords into a single-word set and a multi-word tuple.
+
+    Single plain words are matched against the tokenized message by set
+    intersection; phrases (and anything with punctuation) keep substring
+    semantics.
+    """
+    singles = frozenset(k for k in keywords if k.isalpha())
+    multis = tuple(k for k in keywords if not k.isalpha())
+    return singles, multis
+
 
 class TierService:
     """Service for classifying support tier and severity."""
@@ -49,11 +64,32 @@ class TierService:
     
     MEDIUM_KEYWORDS = [
         "slow", "timeout", "error", "issue", "problem", "not working",
-        "configuration", "setup", "authentication", "can't login", 
+        "configuration", "setup", "authentication", "can't login",
         "access denied", "login loop", "redirect", "keeps logging out",
         "stuck", "frozen"
     ]
-    
+
+    # Container/startup issues which block work (HIGH)
+    BLOCKING_KEYWORDS = ["container", "startup failed", "init failed", "crash"]
+
+    # Single-word sets and multi-word tuples precomputed per category, so
+    # each classify call tokenizes the message once and does set
+    # intersections instead of a substring scan per keyword
+    _TIER_0_SINGLE, _TIER_0_MULTI = _split_keywords(TIER_0_KEYWORDS)
+    _TIER_1_SINGLE, _TIER_1_MULTI = _split_keywords(TIER_1_KEYWORDS)
+    _TIER_2_SINGLE, _TIER_2_MULTI = _split_keywords(TIER_2_KEYWORDS)
+    _TIER_3_SINGLE, _TIER_3_MULTI = _split_keywords(TIER_3_KEYWORDS)
+    _TIER_4_SINGLE, _TIER_4_MULTI = _split_keywords(TIER_4_KEYWORDS)
+    _CRITICAL_SINGLE, _CRITICAL_MULTI = _split_keywords(CRITICAL_KEYWORDS)
+    _HIGH_SINGLE, _HIGH_MULTI = _split_keywords(HIGH_KEYWORDS)
+    _MEDIUM_SINGLE, _MEDIUM_MULTI = _split_keywords(MEDIUM_KEYWORDS)
+    _BLOCKING_SINGLE, _BLOCKING_MULTI = _split_keywords(BLOCKING_KEYWORDS)
+
+    @staticmethod
+    def _matches(tokens: set, message_lower: str, singles: frozenset, multis: tuple) -> bool:
+        """Match a keyword category: token intersection plus phrase scan."""
+        return bool(tokens & singles) or any(p in message_lower for p in multis)
+
     def classify_tier_and_severity(
         self,
         message: str,
@@ -76,12 +112,13 @@ class TierService:
             Tuple of (tier, severity, needs_escalation)
         """
         message_lower = message.lower()
-        
+        tokens = set(_TOKEN_RE.findall(message_lower))
+
         # Determine severity first
-        severity = self._classify_severity(message_lower)
-        
+        severity = self._classify_severity(message_lower, tokens)
+
         # Determine tier
-        tier = self._classify_tier(message_lower, kb_coverage, repeated_failure, severity)
+        tier = self._classify_tier(message_lower, tokens, kb_coverage, repeated_failure, severity)
         
         # Determine if escalation is needed
         needs_escalation = self._needs_escalation(tier, severity, repeated_failure, kb_coverage)
@@ -94,23 +131,24 @@ class TierService:
         
         return (tier, severity, needs_escalation)
     
-    def _classify_severity(self, message_lower: str) -> Severity:
+    def _classify_severity(self, message_lower: str, tokens: set) -> Severity:
         """Classify severity based on message content."""
-        if any(keyword in message_lower for keyword in self.CRITICAL_KEYWORDS):
+        if self._matches(tokens, message_lower, self._CRITICAL_SINGLE, self._CRITICAL_MULTI):
             return Severity.CRITICAL
-        elif any(keyword in message_lower for keyword in self.HIGH_KEYWORDS):
+        elif self._matches(tokens, message_lower, self._HIGH_SINGLE, self._HIGH_MULTI):
             return Severity.HIGH
         # Check for container/startup issues which block work (HIGH)
-        elif any(keyword in message_lower for keyword in ["container", "startup failed", "init failed", "crash"]):
+        elif self._matches(tokens, message_lower, self._BLOCKING_SINGLE, self._BLOCKING_MULTI):
             return Severity.HIGH
-        elif any(keyword in message_lower for keyword in self.MEDIUM_KEYWORDS):
+        elif self._matches(tokens, message_lower, self._MEDIUM_SINGLE, self._MEDIUM_MULTI):
             return Severity.MEDIUM
         else:
             return Severity.LOW
-    
+
     def _classify_tier(
         self,
         message_lower: str,
+        tokens: set,
         kb_coverage: bool,
         repeated_failure: bool,
         severity: Severity
@@ -119,24 +157,24 @@ class TierService:
         # Critical severity or repeated failures escalate to TIER_3
         if severity == Severity.CRITICAL or repeated_failure:
             return Tier.TIER_3
-        
+
         # No KB coverage escalates to TIER_2 or TIER_3
         if not kb_coverage:
             if severity in [Severity.HIGH, Severity.CRITICAL]:
                 return Tier.TIER_3
             else:
                 return Tier.TIER_2
-        
+
         # Check tier keywords
-        if any(keyword in message_lower for keyword in self.TIER_4_KEYWORDS):
+        if self._matches(tokens, message_lower, self._TIER_4_SINGLE, self._TIER_4_MULTI):
             return Tier.TIER_4
-        elif any(keyword in message_lower for keyword in self.TIER_3_KEYWORDS):
+        elif self._matches(tokens, message_lower, self._TIER_3_SINGLE, self._TIER_3_MULTI):
             return Tier.TIER_3
-        elif any(keyword in message_lower for keyword in self.TIER_2_KEYWORDS):
+        elif self._matches(tokens, message_lower, self._TIER_2_SINGLE, self._TIER_2_MULTI):
             return Tier.TIER_2
-        elif any(keyword in message_lower for keyword in self.TIER_1_KEYWORDS):
+        elif self._matches(tokens, message_lower, self._TIER_1_SINGLE, self._TIER_1_MULTI):
             return Tier.TIER_1
-        elif any(keyword in message_lower for keyword in self.TIER_0_KEYWORDS):
+        elif self._matches(tokens, message_lower, self._TIER_0_SINGLE, self._TIER_0_MULTI):
             return Tier.TIER_0
         else:
             # Default to TIER_1 for general queries
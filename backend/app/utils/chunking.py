@@ -1,7 +1,23 @@
 """Document chunking strategies for RAG pipeline."""
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 import re
 
+# Sentence boundary: split after ., ! or ? — compiled once at import
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Default semantic-chunk boundaries, coarsest first; a shared tuple so
+# each call doesn't rebuild the list
+_DEFAULT_DELIMS = ("\n\n", "\n", ". ", " ")
+
+# Whitespace-delimited word runs, for counting without allocation
+_WORD_RE = re.compile(r"\S+")
+
+
+def _word_count(s: str) -> int:
+    """Count words like len(s.split()) without building the list."""
+    return sum(1 for _ in _WORD_RE.finditer(s))
+
 
 class TextChunker:
     """Text chunking strategies with optional overlap."""
@@ -25,29 +41,84 @@ class TextChunker:
         Returns:
             List of chunk strings
         """
+        return list(TextChunker.sliding_window_chunks_iter(
+            text, chunk_size=chunk_size, overlap=overlap, delimiter=delimiter
+        ))
+
+    @staticmethod
+    def sliding_window_chunks_iter(
+        text: str,
+        chunk_size: int = 512,
+        overlap: int = 100,
+        delimiter: str = " "
+    ):
+        """Generator form of sliding_window_chunks.
+
+        Yields chunks one at a time so large documents never hold the
+        full chunk list alongside the source text.
+        """
         if not text or not text.strip():
-            return []
-        
+            return
+
         # Split into tokens (words)
         tokens = text.split(delimiter)
-        
+
         if len(tokens) <= chunk_size:
-            return [text]
-        
-        chunks = []
+            yield text
+            return
+
+        yield from TextChunker._chunks_from_tokens(tokens, delimiter, chunk_size, overlap)
+
+    @staticmethod
+    def sliding_window_chunks_from_tokens(
+        tokens: List[str],
+        chunk_size: int = 512,
+        overlap: int = 100,
+        delimiter: str = " "
+    ) -> List[str]:
+        """
+        Sliding-window chunking over an already-tokenized input.
+
+        For callers that have the token list in hand (or run several
+        strategies over the same text), this skips re-splitting the
+        source string.
+
+        Args:
+            tokens: Token (word) list, as produced by text.split(delimiter)
+            chunk_size: Target size per chunk in tokens
+            overlap: Number of overlapping tokens between consecutive chunks
+            delimiter: Delimiter to rejoin tokens with
+
+        Returns:
+            List of chunk strings
+        """
+        if not tokens:
+            return []
+
+        if len(tokens) <= chunk_size:
+            return [delimiter.join(tokens)]
+
+        return list(TextChunker._chunks_from_tokens(tokens, delimiter, chunk_size, overlap))
+
+    @staticmethod
+    def _chunks_from_tokens(
+        tokens: List[str],
+        delimiter: str,
+        chunk_size: int,
+        overlap: int
+    ):
+        """Yield overlapping windows joined over a token list (len > chunk_size)."""
+        # Window starts computed up front: every step-th index up to and
+        # including the first window that reaches the end of the token
+        # list, replacing the per-iteration end check
+        n = len(tokens)
         step = chunk_size - overlap
-        
-        for i in range(0, len(tokens), step):
-            chunk_tokens = tokens[i : i + chunk_size]
-            chunk_text = delimiter.join(chunk_tokens)
+        last = -(-(n - chunk_size) // step) * step
+
+        for s in range(0, last + 1, step):
+            chunk_text = delimiter.join(tokens[s : s + chunk_size])
             if chunk_text.strip():
-                chunks.append(chunk_text)
-            
-            # Stop if we've reached the end
-            if i + chunk_size >= len(tokens):
-                break
-        
-        return chunks
+                yield chunk_text
     
     @staticmethod
     def semantic_chunks(
@@ -70,49 +141,70 @@ class TextChunker:
         Returns:
             List of chunk strings
         """
+        return list(TextChunker.semantic_chunks_iter(
+            text, chunk_size=chunk_size, overlap=overlap, delimiters=delimiters
+        ))
+
+    @staticmethod
+    def semantic_chunks_iter(
+        text: str,
+        chunk_size: int = 512,
+        overlap: int = 100,
+        delimiters: List[str] = None
+    ):
+        """Generator form of semantic_chunks; yields each chunk as it closes."""
         if not text or not text.strip():
-            return []
-        
+            return
+
         if delimiters is None:
-            delimiters = ["\n\n", "\n", ". ", " "]
-        
+            delimiters = _DEFAULT_DELIMS
+
         # Split at first available delimiter
         current_delimiter = delimiters[0] if delimiters else " "
         for delim in delimiters:
             if delim in text:
                 current_delimiter = delim
                 break
-        
+
         segments = text.split(current_delimiter)
-        chunks = []
         current_chunk = []
+        current_counts = []
         current_chunk_tokens = 0
-        
+
         for segment in segments:
-            segment_tokens = len(segment.split())
-            
+            segment_tokens = _word_count(segment)
+
             # If adding this segment would exceed chunk_size, save current chunk and start new one
             if current_chunk and (current_chunk_tokens + segment_tokens) > chunk_size:
                 chunk_text = current_delimiter.join(current_chunk)
                 if chunk_text.strip():
-                    chunks.append(chunk_text)
-                
-                # Start new chunk with overlap from last segments
-                overlap_segments = int(overlap / max(len(" ".join(current_chunk).split()), 1))
-                current_chunk = current_chunk[-overlap_segments:] if overlap_segments > 0 else []
-                current_chunk_tokens = sum(len(s.split()) for s in current_chunk)
-            
+                    yield chunk_text
+
+                # Start new chunk with overlap from last segments.
+                # current_chunk_tokens already equals the chunk's word
+                # count, and the parallel per-segment count list lets the
+                # trimmed total be summed over just the kept tail — no
+                # join/re-split of the whole chunk per flush
+                overlap_segments = int(overlap / max(current_chunk_tokens, 1))
+                if overlap_segments > 0:
+                    current_chunk = current_chunk[-overlap_segments:]
+                    current_counts = current_counts[-overlap_segments:]
+                    current_chunk_tokens = sum(current_counts)
+                else:
+                    current_chunk = []
+                    current_counts = []
+                    current_chunk_tokens = 0
+
             current_chunk.append(segment)
+            current_counts.append(segment_tokens)
             current_chunk_tokens += segment_tokens
         
         # Add final chunk
         if current_chunk:
             chunk_text = current_delimiter.join(current_chunk)
             if chunk_text.strip():
-                chunks.append(chunk_text)
-        
-        return chunks
-    
+                yield chunk_text
+
     @staticmethod
     def sentence_chunks(
         text: str,
@@ -130,27 +222,37 @@ class TextChunker:
         Returns:
             List of chunk strings
         """
+        return list(TextChunker.sentence_chunks_iter(
+            text, chunk_size=chunk_size, overlap=overlap
+        ))
+
+    @staticmethod
+    def sentence_chunks_iter(
+        text: str,
+        chunk_size: int = 512,
+        overlap: int = 100
+    ):
+        """Generator form of sentence_chunks; yields each chunk as it closes."""
         if not text or not text.strip():
-            return []
-        
+            return
+
         # Simple sentence splitting: split on ., !, ?
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        chunks = []
+        sentences = _SENT_RE.split(text)
+
         current_chunk = []
         current_words = 0
         
         for sentence in sentences:
-            sentence_words = len(sentence.split())
+            sentence_words = _word_count(sentence)
             
             # If adding this sentence would exceed chunk_size, save and start new
             if current_chunk and (current_words + sentence_words) > chunk_size:
                 chunk_text = " ".join(current_chunk)
                 if chunk_text.strip():
-                    chunks.append(chunk_text)
-                
+                    yield chunk_text
+
                 # Overlap: keep last N words
-                last_sentence_words = len(current_chunk[-1].split()) if current_chunk else 0
+                last_sentence_words = _word_count(current_chunk[-1]) if current_chunk else 0
                 if overlap > 0 and last_sentence_words < overlap:
                     # Keep last sentence if it fits in overlap
                     current_chunk = current_chunk[-1:] if current_chunk else []
@@ -166,9 +268,7 @@ class TextChunker:
         if current_chunk:
             chunk_text = " ".join(current_chunk)
             if chunk_text.strip():
-                chunks.append(chunk_text)
-        
-        return chunks
+                yield chunk_text
 
 
 class DocumentChunker:
@@ -195,9 +295,58 @@ class DocumentChunker:
             strategy: Chunking strategy ("sliding_window", "semantic", "sentence")
         
         Returns:
-            List of chunk dicts with keys: content, chunk_index, chunk_count, 
+            List of chunk dicts with keys: content, chunk_index, chunk_count,
             original_doc_title, doc_metadata
         """
+        cols = DocumentChunker.chunk_document_columnar(
+            title, content, doc_metadata,
+            chunk_size=chunk_size, overlap=overlap, strategy=strategy
+        )
+
+        # Per-document fields merged once; each chunk's metadata is a
+        # single overlay adding its index. A shared ChainMap would avoid
+        # even that, but chunk metadata is JSON-serialized into the DB,
+        # so each chunk needs a real dict of its own.
+        chunk_count = cols["chunk_count"]
+        base_metadata = {
+            **(doc_metadata or {}),
+            "chunk_count": chunk_count,
+            "original_doc_title": title
+        }
+
+        return [
+            {
+                "content": chunk_text,
+                "chunk_index": i,
+                "chunk_count": chunk_count,
+                "original_doc_title": title,
+                "doc_metadata": {**base_metadata, "chunk_index": i}
+            }
+            for i, chunk_text in enumerate(cols["content"])
+        ]
+
+    @staticmethod
+    def chunk_document_columnar(
+        title: str,
+        content: str,
+        doc_metadata: Dict[str, Any],
+        chunk_size: int = 512,
+        overlap: int = 100,
+        strategy: str = "sliding_window"
+    ) -> Dict[str, Any]:
+        """
+        Chunk a document into a columnar (structure-of-arrays) result.
+
+        Instead of one dict per chunk — each carrying a copy of the
+        document metadata — this returns a single dict of parallel
+        columns with the per-document fields stored once:
+
+            {"content": [...], "chunk_count": n, "title": ...,
+             "doc_metadata": ...}
+
+        Memory stays proportional to the text, not chunks × metadata.
+        Iterate with enumerate(cols["content"]) for per-chunk indexes.
+        """
         if strategy == "sliding_window":
             chunk_texts = TextChunker.sliding_window_chunks(
                 content, chunk_size=chunk_size, overlap=overlap
@@ -212,24 +361,68 @@ class DocumentChunker:
             )
         else:
             raise ValueError(f"Unknown chunking strategy: {strategy}")
-        
+
         # If no chunks (empty content), return at least one empty chunk
         if not chunk_texts:
             chunk_texts = [content] if content else [""]
-        
-        chunks = []
-        for i, chunk_text in enumerate(chunk_texts):
-            chunk_metadata = doc_metadata.copy() if doc_metadata else {}
-            chunk_metadata["chunk_index"] = i
-            chunk_metadata["chunk_count"] = len(chunk_texts)
-            chunk_metadata["original_doc_title"] = title
-            
-            chunks.append({
-                "content": chunk_text,
-                "chunk_index": i,
-                "chunk_count": len(chunk_texts),
-                "original_doc_title": title,
-                "doc_metadata": chunk_metadata
-            })
-        
-        return chunks
+
+        return {
+            "content": chunk_texts,
+            "chunk_count": len(chunk_texts),
+            "title": title,
+            "doc_metadata": doc_metadata
+        }
+
+    @staticmethod
+    def chunk_many(
+        docs: Iterable[Tuple[str, str, Dict[str, Any]]],
+        chunk_size: int = 512,
+        overlap: int = 100,
+        strategy: str = "sliding_window",
+        max_workers: Optional[int] = None,
+        batch_size: int = 32
+    ) -> List[Dict[str, Any]]:
+        """
+        Chunk many documents in parallel across worker processes.
+
+        Chunking is pure CPU and each document is independent, so a
+        process pool scales near-linearly with cores; documents are
+        dispatched in batches so IPC overhead is amortized over small
+        documents.
+
+        Args:
+            docs: Iterable of (title, content, doc_metadata) tuples
+            chunk_size: Target chunk size in tokens/words
+            overlap: Overlap between chunks in tokens/words
+            strategy: Chunking strategy (see chunk_document)
+            max_workers: Pool size (defaults to the CPU count)
+            batch_size: Documents per dispatched batch
+
+        Returns:
+            Flat list of chunk dicts, preserving input document order
+        """
+        jobs = [
+            (title, content, doc_metadata, chunk_size, overlap, strategy)
+            for title, content, doc_metadata in docs
+        ]
+
+        if len(jobs) <= batch_size:
+            # Too few documents to pay the process-pool startup cost
+            per_doc = map(_chunk_one, jobs)
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                per_doc = list(executor.map(_chunk_one, jobs, chunksize=batch_size))
+
+        return [chunk for doc_chunks in per_doc for chunk in doc_chunks]
+
+
+def _chunk_one(args: Tuple) -> List[Dict[str, Any]]:
+    """Chunk a single (title, content, metadata, *params) job.
+
+    Module-level so it is picklable for ProcessPoolExecutor workers.
+    """
+    title, content, doc_metadata, chunk_size, overlap, strategy = args
+    return DocumentChunker.chunk_document(
+        title, content, doc_metadata,
+        chunk_size=chunk_size, overlap=overlap, strategy=strategy
+    )
@@ -1,4 +1,5 @@
 """Configuration management using Pydantic settings."""
+from functools import cached_property, lru_cache
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -12,12 +13,22 @@ class Settings(BaseSettings):
     # LLM Provider
     llm_provider: str = "openai"
     llm_model: str = "gpt-4-turbo-preview"
+    llm_max_tokens: int = 1024
     openai_api_key: str | None = None
     anthropic_api_key: str | None = None
     
     # Embeddings
     embedding_model: str = "text-embedding-3-small"
     embedding_dimension: int = 1536
+    embedding_batch_size: int = 16
+    embedding_batch_wait_ms: int = 75
+
+    # KB ingestion
+    ingest_concurrency: int = 8
+
+    # Semantic response cache
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_ttl_hours: int = 24
     
     # Application
     log_level: str = "INFO"
@@ -28,10 +39,20 @@ class Settings(BaseSettings):
     # CORS
     cors_origins: str = "http://localhost:5173,http://localhost:3000"
     
-    @property
+    @cached_property
     def cors_origins_list(self) -> List[str]:
-        """Parse CORS origins from comma-separated string."""
+        """Parse CORS origins from comma-separated string (once)."""
         return [origin.strip() for origin in self.cors_origins.split(",")]
+
+    @property
+    def async_database_url(self) -> str:
+        """Database URL rewritten to use an async driver."""
+        url = self.database_url
+        if url.startswith("postgresql://"):
+            return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+        if url.startswith("sqlite://"):
+            return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+        return url
     
     # Guardrails
     guardrail_strict_mode: bool = True
@@ -46,5 +67,20 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Build the global settings instance on first use and cache it."""
+    return Settings()
+
+
+def __getattr__(name: str):
+    """Defer env parsing until `settings` is first accessed (PEP 562).
+
+    `from app.utils.config import settings` keeps working and still
+    yields one shared instance, but importing this module (e.g. from a
+    script that only needs the logger) no longer reads and validates
+    the environment.
+    """
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
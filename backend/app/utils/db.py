@@ -1,10 +1,11 @@
 """Database connection and session management."""
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.utils.config import settings
 
-# Create database engine
+# Sync engine kept for scripts (init_db, KB ingestion)
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,
@@ -12,17 +13,40 @@ engine = create_engine(
     max_overflow=20
 )
 
-# Create session factory
+# Async engine used by the API request path (non-blocking DB I/O)
+async_engine = create_async_engine(
+    settings.async_database_url,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db():
-    """Dependency for getting database session."""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Dependency for getting an async database session."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def next_ticket_id(db) -> str:
+    """Allocate the next ticket ID (TICKET-NNNN) in a single round trip.
+
+    Uses a Postgres sequence when available; on SQLite, derives the next
+    numeric suffix from the current maximum inside the open transaction.
+    Avoids the racy COUNT(*)-based ID generation under concurrent creates.
+    """
+    if db.bind.dialect.name == "postgresql":
+        next_id = (await db.execute(text("SELECT nextval('ticket_seq')"))).scalar()
+    else:
+        max_suffix = (await db.execute(text(
+            "SELECT max(cast(substr(id, 8) as integer)) FROM tickets"
+        ))).scalar()
+        next_id = (max_suffix or 0) + 1
+    return f"TICKET-{next_id:04d}"
@@ -1,19 +1,30 @@
 """Structured logging configuration."""
 import structlog
 import logging
+import logging.handlers
+import queue
 import sys
 from app.utils.config import settings
 
 
 def setup_logging():
-    """Configure structured logging with structlog."""
-    
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=getattr(logging, settings.log_level.upper()),
-    )
-    
+    """Configure structured logging with structlog.
+
+    Log records are handed to a QueueHandler and written to stdout by a
+    QueueListener thread, so the (blocking) stream write happens off the
+    event loop instead of inside request handlers.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(getattr(logging, settings.log_level.upper()))
+
     structlog.configure(
         processors=[
             structlog.stdlib.filter_by_level,
@@ -31,6 +42,8 @@ def setup_logging():
         cache_logger_on_first_use=True,
     )
 
+    return listener
+
 
 def get_logger(name: str):
     """Get a structured logger instance."""
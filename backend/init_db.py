@@ -23,7 +23,18 @@ def create_tables():
         # Create tables
         Base.metadata.create_all(bind=engine)
         logger.info("database_tables_created")
-        
+
+        # Create ticket ID sequence and vector index (Postgres only)
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as conn:
+                conn.execute(text("CREATE SEQUENCE IF NOT EXISTS ticket_seq"))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_kb_documents_embedding_hnsw "
+                    "ON kb_documents USING hnsw (embedding vector_cosine_ops)"
+                ))
+            logger.info("ticket_sequence_created")
+            logger.info("kb_embedding_hnsw_index_created")
+
         # Verify pgvector extension
         with engine.connect() as conn:
             result = conn.execute(text("SELECT * FROM pg_extension WHERE extname = 'vector'"))
@@ -46,19 +57,18 @@ def verify_setup():
     
     try:
         with engine.connect() as conn:
-            # Check if tables exist
+            # Check if tables exist — one parameter-bound round trip for
+            # all of them instead of a query per table
             tables = ['conversations', 'messages', 'kb_documents', 'tickets', 'guardrail_events']
-            
+
+            result = conn.execute(text("""
+                SELECT table_name FROM information_schema.tables
+                WHERE table_schema = 'public' AND table_name = ANY(:names)
+            """), {"names": tables})
+            found = {row[0] for row in result}
+
             for table in tables:
-                result = conn.execute(text(f"""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_name = '{table}'
-                    )
-                """))
-                exists = result.fetchone()[0]
-                
-                if exists:
+                if table in found:
                     logger.info("table_verified", table=table)
                 else:
                     logger.error("table_missing", table=table)
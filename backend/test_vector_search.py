@@ -0,0 +1,95 @@
+"""Smoke test for pgvector similarity search over kb_documents."""
+import asyncio
+import functools
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent))
+
+from sqlalchemy import func, select, text
+
+from app.models.database import KBDocument, EMBEDDING_IS_VECTOR
+from app.services.embedding_service import EmbeddingService
+from app.utils.db import AsyncSessionLocal
+from app.utils.logger import setup_logging, get_logger
+
+setup_logging()
+logger = get_logger(__name__)
+
+TEST_QUERY = "How do I reset my password?"
+
+
+@functools.lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    """One embedding service per process, so looped runs reuse the client."""
+    return EmbeddingService()
+
+
+async def test_vector_search(query: str = TEST_QUERY, top_k: int = 5):
+    """Run one similarity search and print the top matches.
+
+    The query embedding travels as a bound parameter through pgvector's
+    registered Vector column type — not as an interpolated text literal —
+    so the server never re-parses a multi-KB array string and the driver
+    ships the vector once per query.
+    """
+    if not EMBEDDING_IS_VECTOR:
+        print("pgvector is not active (non-Postgres database or pgvector missing); nothing to test.")
+        return
+
+    embedding = await get_embedding_service().generate_embedding(query)
+
+    # The async session rides the asyncpg engine the API itself uses, so
+    # the query doesn't block the event loop and the vector crosses the
+    # wire in asyncpg's binary protocol; repeated invocations in one
+    # process reuse the pooled connection
+    async with AsyncSessionLocal() as db:
+        # Make sure the ANN index exists so the ORDER BY is an HNSW
+        # traversal, not a sequential scan doing a cosine per row; then
+        # raise ef_search a bit for better recall at this small top_k
+        await db.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_kb_documents_embedding_hnsw "
+            "ON kb_documents USING hnsw (embedding vector_cosine_ops)"
+        ))
+        await db.commit()
+        await db.execute(text("SET hnsw.ef_search = 40"))
+
+        # The embedded-row count rides along as a scalar subquery, so
+        # count + search cost one round trip instead of two
+        total_sq = (
+            select(func.count()).select_from(KBDocument)
+            .where(KBDocument.embedding.isnot(None))
+            .scalar_subquery()
+        )
+
+        distance = KBDocument.embedding.cosine_distance(embedding)
+        rows = (await db.execute(
+            select(KBDocument.id, KBDocument.title,
+                   (1 - distance).label("similarity"),
+                   total_sq.label("total"))
+            .where(KBDocument.embedding.isnot(None))
+            .order_by(distance)
+            .limit(top_k)
+        )).all()
+
+        total = rows[0].total if rows else 0
+
+        # One buffered write instead of a flush per line, so a raised
+        # LIMIT doesn't turn reporting into the hot loop
+        out = [
+            f"KB documents with embeddings: {total}",
+            "",
+            f"Top {top_k} matches for: {query!r}",
+        ]
+        out.extend(
+            f"{i}. {row.title}\n"
+            f"   similarity={row.similarity:.4f}\n"
+            f"   id={row.id}"
+            for i, row in enumerate(rows, 1)
+        )
+        print("\n".join(out))
+
+
+if __name__ == "__main__":
+    asyncio.run(test_vector_search())